@@ -5,63 +5,147 @@ Author: Tim Grundey
 Created: 03.10.2025
 """
 
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from geopy.distance import geodesic
+from system.loader import getConfig
+
+class OpenMeteoClient:
+    def __init__(self, geocodingUrl: str, forecastUrl: str, timeout: float = 10.0, ttl: float = 900.0, cachePath: str = None):
+        # Reuse one HTTP session (keep-alive) for all requests
+        self.session = requests.Session()
+        self.geocodingUrl = geocodingUrl
+        self.forecastUrl = forecastUrl
+        self.timeout = timeout
+        self.ttl = ttl
+        self.cachePath = cachePath
+        self.lock = threading.Lock()
+
+        # Geocoding results never change, forecasts are cached for ttl seconds by coordinates
+        self.geocodes: dict[str, list[float]] = {}
+        self.forecasts: dict[tuple[float, float], tuple[float, dict]] = {}
+        if cachePath is not None and os.path.exists(cachePath):
+            # A damaged cache file is ignored (rewritten on the next geocoding request)
+            try:
+                with open(cachePath) as file:
+                    geocodes = json.load(file)
+                if isinstance(geocodes, dict):
+                    self.geocodes = geocodes
+            except (OSError, ValueError) as ex:
+                logging.warning(f"Geocoding cache {cachePath} ignored: {ex}")
+
+    def get(self, url: str, params: dict) -> dict:
+        """Sends a GET request and returns the JSON response."""
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as ex:
+            raise ConnectionError(f"Error retrieving data: {ex}")
+        if response.status_code != 200:
+            raise ConnectionError(f"Error retrieving data: {response.status_code}")
+        return response.json()
+
+    def geocode(self, location: str) -> tuple[float, float]:
+        """Returns latitute and longitude based on the chosen location."""
+        key = location.strip().lower()
+        if key in self.geocodes:
+            return tuple(self.geocodes[key])
+
+        # Send API request
+        data = self.get(self.geocodingUrl, {"name": location, "count": 1, "language": "de"})
+
+        # Check if data contains a result
+        if "results" in data and len(data["results"]) > 0:
+            latitude = data["results"][0]["latitude"]
+            longitude = data["results"][0]["longitude"]
+        else:
+            raise ValueError("Location not found")
+
+        # Store result permanently
+        with self.lock:
+            self.geocodes[key] = [latitude, longitude]
+            if self.cachePath is not None:
+                # Write to a temporary file first (one per process), readers never see half a cache
+                temporary = f"{self.cachePath}.{os.getpid()}.tmp"
+                with open(temporary, "w") as file:
+                    json.dump(self.geocodes, file)
+                os.replace(temporary, self.cachePath)
+        return latitude, longitude
+
+    def forecast(self, latitude: float, longitude: float) -> dict:
+        """Returns the forecast (JSON) for the chosen coordinates."""
+        key = (round(latitude, 2), round(longitude, 2))
+        cached = self.forecasts.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+
+        # Send API request
+        data = self.get(self.forecastUrl, {
+            "latitude": latitude,
+            "longitude": longitude,
+            "hourly": "temperature_2m,precipitation",
+            "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum",
+            "timezone": "Europe/Berlin",
+        })
+        with self.lock:
+            self.forecasts[key] = (time.monotonic(), data)
+        return data
+
+    def getForecast(self, location: str) -> dict:
+        """Returns the forecast (JSON) for the chosen location."""
+        latitude, longitude = self.geocode(location)
+        return self.forecast(latitude, longitude)
+
+    def getForecasts(self, locations: list[str]) -> dict[str, dict]:
+        """Returns the forecasts (JSON) of several locations, requested concurrently."""
+        with ThreadPoolExecutor(max_workers=min(8, max(1, len(locations)))) as executor:
+            return dict(zip(locations, executor.map(self.getForecast, locations)))
+
+# Shared client, created on first use
+client: OpenMeteoClient = None
+
+def getClient() -> OpenMeteoClient:
+    """Returns the shared Open-Meteo client configured in the config file."""
+    global client
+    if client is None:
+        client = OpenMeteoClient(
+            geocodingUrl=getConfig("weather", "geocodingUrl"),
+            forecastUrl=getConfig("weather", "forecastUrl"),
+            timeout=getConfig("weather", "timeout"),
+            ttl=getConfig("weather", "forecastTTL"),
+            cachePath=getConfig("weather", "geocodeCache"))
+    return client
 
 # Open-Meteo Weather API
 def getWeather(location: str):
     """Returns a current weather forecast based on the chosen location."""
-    # Get coordinates for location
-    latitude : float; longitude : float
-    latitude, longitude = geocode(location)
-
-    # Create URL and send API request
-    url = (
-        f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}"
-        f"&hourly=temperature_2m,precipitation"
-        f"&daily=temperature_2m_max,temperature_2m_min,precipitation_sum"
-        f"&timezone=Europe%2FBerlin")
-    response = requests.get(url)
-
-    # Parse data if request was successful
+    return formatForecast(getClient().getForecast(location))
+
+def formatForecast(data: dict) -> str:
+    """Returns a forecast (JSON) as text."""
     forecast = ""
-    if response.status_code == 200:
-        data = response.json()
-        forecast += f"Current forecast (hourly):\n"
-        forecast += f"--------------------\n"
-        forecast += f"> Hourly temperatures (in °C):\n"
-        forecast += f"  {data['hourly']['temperature_2m'][:6]}\n\n"
-        forecast += f"> Rainfall (in mm):\n"
-        forecast += f"  {data['hourly']['precipitation'][:6]}\n\n"
-        forecast += f"Daily forecast:\n"
-        forecast += f"----------------\n"
-        for date, tmax, tmin, rain in zip(
-            data["daily"]["time"],
-            data["daily"]["temperature_2m_max"],
-            data["daily"]["temperature_2m_min"],
-            data["daily"]["precipitation_sum"],
-        ):
-            forecast += f"{date}: {tmin}°C – {tmax}°C, Rain: {rain} mm\n"
-    else:
-        raise ConnectionError(f"Error retrieving weather data: {response.status_code}")
+    forecast += f"Current forecast (hourly):\n"
+    forecast += f"--------------------\n"
+    forecast += f"> Hourly temperatures (in °C):\n"
+    forecast += f"  {data['hourly']['temperature_2m'][:6]}\n\n"
+    forecast += f"> Rainfall (in mm):\n"
+    forecast += f"  {data['hourly']['precipitation'][:6]}\n\n"
+    forecast += f"Daily forecast:\n"
+    forecast += f"----------------\n"
+    for date, tmax, tmin, rain in zip(
+        data["daily"]["time"],
+        data["daily"]["temperature_2m_max"],
+        data["daily"]["temperature_2m_min"],
+        data["daily"]["precipitation_sum"],
+    ):
+        forecast += f"{date}: {tmin}°C – {tmax}°C, Rain: {rain} mm\n"
     return forecast
 
 # Open-Meteo Geocoding API
 def geocode(location: str):
     """Returns latitute and longitude based on the chosen location."""
-    # Create URL and send API request
-    url = f"https://geocoding-api.open-meteo.com/v1/search?name={location}&count=1&language=de"
-    response = requests.get(url)
-
-    # Parse data if request was successful
-    if response.status_code == 200:
-        data = response.json()
-        # Check if data contains a result
-        if "results" in data and len(data["results"]) > 0:  
-            latitude = data["results"][0]["latitude"]
-            longitude = data["results"][0]["longitude"]
-            return latitude, longitude
-        else:
-            raise ValueError("Location not found")
-    else:
-        raise ConnectionError(f"Error retrieving geodata: {response.status_code}")
+    return getClient().geocode(location)
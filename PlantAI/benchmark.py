@@ -0,0 +1,300 @@
+"""
+Description:
+    Micro-benchmarks for the database layer, run with: python3 PlantAI/benchmark.py <name>
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from core.models import measurement, measurementSeries
+from database import connector
+from database.adapter import DBAdapterMeasurement
+from database.connector import createDB, useDatabase, execute, executemany, fetchone
+
+def setup() -> str:
+    """Creates an empty database in a temporary directory and returns its path."""
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    useDatabase(path)
+    createDB("PlantAI/database/PlantAI.sql")
+    return path
+
+def timeit(name: str, count: int, function):
+    """Runs a function count times and prints the throughput."""
+    start = time.perf_counter()
+    for x in range(count):
+        function()
+    duration = time.perf_counter() - start
+    print(f"{name:<40} {count / duration:>12.0f} ops/s")
+
+def queries(count: int = 20000):
+    """Compares one connection per query with the pooled connection."""
+    path = setup()
+    query = "SELECT COUNT(*) FROM measurements WHERE sensorId = ?"
+
+    def unpooled():
+        # Previous behaviour: open a new connection for every query
+        con = sqlite3.connect(path)
+        cur = con.cursor()
+        cur.execute(query, (1,))
+        cur.fetchone()
+        cur.close()
+
+    timeit("queries (connection per query)", count, unpooled)
+    timeit("queries (pooled connection)", count, lambda: fetchone(query, (1,)))
+    connector.close()
+
+def inserts(count: int = 5000):
+    """Compares single inserts with one batched insert."""
+    setup()
+    dbAdapter = DBAdapterMeasurement()
+    rows = [measurement(1, 30.0, 20.0, -1, 1750000000 + x * 60) for x in range(count)]
+
+    start = time.perf_counter()
+    for entry in rows:
+        dbAdapter.insert(entry)
+    print(f"{'inserts (commit per row)':<40} {count / (time.perf_counter() - start):>12.0f} rows/s")
+
+    start = time.perf_counter()
+    dbAdapter.insertMany(rows * 20)
+    print(f"{'inserts (insertMany)':<40} {count * 20 / (time.perf_counter() - start):>12.0f} rows/s")
+    connector.close()
+
+def labelling(sizes: tuple = (10000, 100000)):
+    """Compares the per-row UPDATE loop with the set-based minutes until dry labelling."""
+    for count in sizes:
+        for name in ("per-row loop", "set-based"):
+            setup()
+            dbAdapter = DBAdapterMeasurement()
+            start = int(datetime(2025, 10, 1).timestamp())
+            dbAdapter.insertMany(measurement(1, 30.0, 20.0, -1, start + x * 60) for x in range(count))
+            recent = dbAdapter.getSingle(sensor=1, mode="recent")
+
+            begin = time.perf_counter()
+            if name == "per-row loop":
+                # Previous behaviour of core.measurements.setMinutesUntilDry
+                recentTime = datetime.fromtimestamp(recent.timestamp)
+                for entry in dbAdapter.getList(sensor=1, limit=-1, mode="current"):
+                    actTime = datetime.fromtimestamp(entry.timestamp)
+                    dbAdapter.update(entry.measureId, (recentTime - actTime).total_seconds() / 60.0)
+            else:
+                dbAdapter.updateMinutesUntilDry(recent.sensorId, recent.timestamp)
+            print(f"{f'labelling {count} rows ({name})':<40} {time.perf_counter() - begin:>12.3f} s")
+            connector.close()
+
+def latency(count: int = 2000000, sensors: int = 10):
+    """Measures query latency of getSingle and getList on a large table with and without indexes."""
+    setup()
+    dbAdapter = DBAdapterMeasurement()
+    start = int(datetime(2025, 1, 1).timestamp())
+    query = "INSERT INTO measurements (sensorId, moisture, temperature, minUntilDry, timestamp) VALUES (?, ?, ?, ?, ?)"
+    executemany(query, ((x % sensors + 1, 30.0, 20.0, -1 if x > count - 1000 else 60, start + x * 60) for x in range(count)), 100000)
+
+    for name in ("indexed", "no index"):
+        if name == "no index":
+            execute("DROP INDEX measurementsBySensorDry")
+            execute("DROP INDEX measurementsBySensorTime")
+        timeit(f"getSingle recent ({name})", 20, lambda: dbAdapter.getSingle(sensor=5, mode="recent"))
+        timeit(f"getList 100 all ({name})", 20, lambda: dbAdapter.getList(sensor=5, limit=100, mode="all"))
+        timeit(f"getList 100 archived ({name})", 20, lambda: dbAdapter.getList(sensor=5, limit=100, mode="archived"))
+    connector.close()
+
+def measure(name: str, count: int, function):
+    """Runs a function once and prints throughput and peak memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<40} {count / duration:>12.0f} rows/s {peak / 2**20:>10.1f} MiB peak")
+
+def columnar(count: int = 1000000):
+    """Compares the object path (getList) with the columnar fetch for training data."""
+    import pandas as pd
+    setup()
+    dbAdapter = DBAdapterMeasurement()
+    start = int(datetime(2025, 1, 1).timestamp())
+    query = "INSERT INTO measurements (sensorId, moisture, temperature, minUntilDry, timestamp) VALUES (?, ?, ?, ?, ?)"
+    executemany(query, ((1, 30.0, 20.0, x % 5000, start + x * 60) for x in range(count)), 100000)
+
+    def objects():
+        # Previous behaviour of core.predictions.hoursUntilDry
+        allMeasurements = dbAdapter.getList(sensor=1, limit=-1, mode="archived")
+        pd.DataFrame({'minUntilDry': [entry.minUntilDry for entry in allMeasurements],
+                      'moisture': [entry.moisture for entry in allMeasurements]})
+
+    measure("training data (getList objects)", count, objects)
+    measure("training data (getFrame columns)", count,
+            lambda: dbAdapter.getFrame(sensor=1, mode="archived", columns=("moisture", "minUntilDry")))
+    connector.close()
+
+def memory(count: int = 200000):
+    """Compares memory per row of dict-based objects, slotted measurements and a measurement series."""
+    class dictMeasurement:
+        # Previous core.models.measurement without __slots__
+        def __init__(self, sensorId, moisture, temperature, minUntilDry, timestamp, measureId=0):
+            self.measureId = measureId
+            self.sensorId = sensorId
+            self.moisture = moisture
+            self.temperature = temperature
+            self.minUntilDry = minUntilDry
+            self.timestamp = timestamp
+
+    def rows():
+        # New values for every row, like rows read from the database
+        for x in range(count):
+            yield (x + 1000, 1, 30.0 + x * 1e-6, 20.0 + x * 1e-6, x + 1000, 1750000000 + x * 60)
+
+    for name, function in (
+        ("objects (__dict__)", lambda: [dictMeasurement(row[1], row[2], row[3], row[4], row[5], row[0]) for row in rows()]),
+        ("objects (__slots__)", lambda: [measurement(row[1], row[2], row[3], row[4], row[5], row[0]) for row in rows()]),
+        ("measurementSeries", lambda: measurementSeries.fromRows(rows())),
+    ):
+        tracemalloc.start()
+        result = function()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{f'memory {name}':<40} {size / count:>12.0f} bytes/row")
+        del result
+
+def importTime(modules: list[str]) -> tuple[float, list[tuple[int, str]], set[str]]:
+    """Imports modules in a new interpreter (-X importtime), returns wall time, top-level import times [us] and all loaded modules."""
+    code = f"import sys, {', '.join(modules)}; print(','.join(sys.modules))"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    duration = time.perf_counter() - start
+
+    # Lines: "import time: self [us] | cumulative [us] | name" (nested imports are indented)
+    imports = []
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[1].strip().isdigit() and not fields[2][1:].startswith(" "):
+            imports.append((int(fields[1]), fields[2].strip()))
+    return duration, sorted(imports, reverse=True), set(result.stdout.strip().split(","))
+
+def startup(top: int = 8):
+    """Measures the imports of main.py until the acquisition thread starts and the modules loaded on demand."""
+    boot = ["core.measurements", "core.features", "database.connector", "database.adapter",
+            "interface.console", "interface.server", "system.loader"]
+    heavy = ["numpy", "pandas", "sklearn", "matplotlib", "joblib", "requests", "geopy"]
+    for name, modules in (("boot", boot), ("predictions (on demand)", ["core.predictions"])):
+        duration, imports, loaded = importTime(modules)
+        print(f"{f'startup {name}':<40} {duration * 1000:>12.0f} ms (interpreter + imports)")
+        for cumulative, module in imports[:top]:
+            print(f"  {module:<38} {cumulative / 1000:>12.1f} ms")
+        print(f"  {'heavy modules loaded':<38} {', '.join(module for module in heavy if module in loaded) or '-':>12}")
+
+def predictions(sensors: int = 8, interval: float = 0.02):
+    """Compares the lateness of a fast acquisition task while models are trained in threads or in worker processes."""
+    import contextlib
+    import io
+    import yaml
+    from concurrent.futures import ThreadPoolExecutor
+    from loadgen import run
+    from core import predictions as models
+    from core.scheduler import Scheduler
+    from core.service import PredictionService
+    from system import loader
+
+    # Simulated drying cycles of all sensors (output of the load generator is hidden)
+    path = os.path.join(tempfile.mkdtemp(), "predictions.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(sensors=sensors, interval=0.005, duration=3, acceleration=100000, noise=0.1, path=path)
+    dbAdapter = DBAdapterMeasurement()
+    sensorIds = [entry[0] for entry in connector.fetchall("SELECT DISTINCT sensorId FROM measurements")]
+
+    def train(mode: str):
+        # New model directory, so every model is trained again
+        config = dict(loader.loadConfig())
+        config["predictions"] = dict(config["predictions"], modelPath=tempfile.mkdtemp())
+        configPath = os.path.join(tempfile.mkdtemp(), "config.yaml")
+        with open(configPath, "w") as stream:
+            yaml.safe_dump(config, stream)
+        loader.path = configPath
+        models.models.clear()
+
+        if mode == "threads":
+            with ThreadPoolExecutor(len(sensorIds)) as executor:
+                list(executor.map(lambda sensor: models.minutesUntilDry(dbAdapter, sensor), sensorIds))
+        else:
+            service = PredictionService()
+            service.predictMany(sensorIds)
+            service.shutdown()
+
+    originalPath = loader.path
+    for mode in ("threads", "processes"):
+        # Acquisition stand-in: short Python work every interval seconds
+        scheduler = Scheduler()
+        scheduler.every(interval, lambda: sum(range(2000)), "acquisition")
+        thread = threading.Thread(target=scheduler.run, daemon=True)
+        thread.start()
+        start = time.perf_counter()
+        train(mode)
+        duration = time.perf_counter() - start
+        scheduler.stop()
+        loader.path = originalPath
+        metrics = scheduler.getMetrics()["acquisition"]
+        print(f"{f'predictions {mode} ({len(sensorIds)} sensors)':<40} {duration:>10.2f} s    "
+              f"lateness mean {metrics['latenessMean'] * 1000:.1f} ms, max {metrics['latenessMax'] * 1000:.1f} ms, missed {metrics['missed']}")
+
+def regressors(sensors: int = 4, count: int = 200):
+    """Compares fit time, inference latency, model size and cross-validated MAE of all model types."""
+    import contextlib
+    import io
+    import pickle
+    from loadgen import run
+    from core.predictions import getFeatures, modelTypes, scoreModels, trainModel
+
+    # Simulated drying cycles (output of the load generator is hidden)
+    path = os.path.join(tempfile.mkdtemp(), "models.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(sensors=sensors, interval=0.005, duration=3, acceleration=100000, noise=0.1, path=path)
+    dbAdapter = DBAdapterMeasurement()
+    frames = [getFeatures(dbAdapter, sensor) for sensor in range(1, sensors + 1)]
+    scores = [scoreModels(df, features) for df, features in frames]
+
+    for name in modelTypes:
+        fit = latency = size = 0.0
+        for df, features in frames:
+            start = time.perf_counter()
+            pipe = trainModel(df, features, name)
+            fit += time.perf_counter() - start
+
+            # Single prediction, like the console and the API
+            row = df[features].iloc[[len(df) // 2]]
+            start = time.perf_counter()
+            for x in range(count):
+                pipe.predict(row)
+            latency += (time.perf_counter() - start) / count
+            size += len(pickle.dumps(pipe))
+        mae = sum(score[name] for score in scores) / sensors
+        print(f"{f'model {name}':<40} fit {fit / sensors * 1000:>8.1f} ms   predict {latency / sensors * 1e6:>8.0f} us   "
+              f"size {size / sensors / 1024:>8.1f} KiB   MAE {mae:>8.1f} min")
+    print(f"{'auto selection per sensor':<40} {', '.join(min(score, key=score.get) for score in scores)}")
+    print(f"{'rows per sensor':<40} {sum(len(df) for df, features in frames) // sensors}")
+
+benchmarks = {
+    "queries": queries,
+    "inserts": inserts,
+    "labelling": labelling,
+    "latency": latency,
+    "columnar": columnar,
+    "memory": memory,
+    "startup": startup,
+    "predictions": predictions,
+    "models": regressors,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        benchmarks[name]()
@@ -0,0 +1,72 @@
+"""
+Description:
+    A/D-Converter backends, ADS1115 via I2C or simulated for testing without hardware
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import math
+import random
+import time
+from abc import ABC, abstractmethod
+
+class ADC(ABC):
+    @abstractmethod
+    def readVoltage(self, channel: int) -> float:
+        pass
+
+class ADS1115(ADC):
+    def __init__(self, i2cAddress: int, bus: int = 7):
+        # Initialize ADS1115 via I2C (only available on the Jetson Nano)
+        import ADS1x15
+        self.ads = ADS1x15.ADS1115(bus, i2cAddress)
+
+        # Set the max. Voltage to be measured
+        self.ads.setGain(self.ads.PGA_4_096V)
+
+    def readVoltage(self, channel: int) -> float:
+        """Returns the current voltage [V] of channel 0..3."""
+        return self.ads.toVoltage(self.ads.readADC(channel))
+
+class SimulatedADC(ADC):
+    def __init__(self, i2cAddress: int, acceleration: float = 1.0, noise: float = 0.1, seed: int = None, clock = time.monotonic):
+        # Same address (or seed) always produces the same soil and noise
+        self.random = random.Random(i2cAddress if seed is None else seed)
+        self.acceleration = acceleration
+        self.noise = noise
+        self.clock = clock
+        self.start = clock()
+
+        # Drying curve per SMT50 (two channels each): moisture [%] falls from wet towards dry
+        self.soils = []
+        for x in range(2):
+            wet = self.random.uniform(38.0, 45.0)
+            dry = self.random.uniform(3.0, 6.0)
+            waterAt = self.random.uniform(12.0, 18.0)       # Plant gets watered at this moisture
+            tau = self.random.uniform(48.0, 120.0) * 3600.0  # Drying time constant [s]
+            cycle = tau * math.log((wet - dry) / (waterAt - dry))
+            self.soils.append((wet, dry, tau, cycle, self.random.uniform(0.0, cycle)))
+
+    def now(self) -> float:
+        """Returns the simulated seconds since start."""
+        return (self.clock() - self.start) * self.acceleration
+
+    def moisture(self, soil: int, seconds: float) -> float:
+        """Returns the noise-free moisture [%] of a soil at simulated seconds."""
+        wet, dry, tau, cycle, phase = self.soils[soil]
+        # Exponential drying, the plant is watered (back to wet) at the end of every cycle
+        return dry + (wet - dry) * math.exp(-((seconds + phase) % cycle) / tau)
+
+    def temperature(self, seconds: float) -> float:
+        """Returns the noise-free temperature [°C] at simulated seconds (day/night cycle)."""
+        return 21.0 + 3.0 * math.sin(2.0 * math.pi * seconds / 86400.0)
+
+    def readVoltage(self, channel: int) -> float:
+        """Returns a simulated voltage [V], channels 0/2 = moisture, 1/3 = temperature."""
+        seconds = self.now()
+        if channel % 2 == 0:
+            moisture = self.moisture(channel // 2, seconds) + self.random.gauss(0.0, self.noise)
+            return moisture * 3.0 / 50.0
+        else:
+            temperature = self.temperature(seconds) + self.random.gauss(0.0, self.noise)
+            return temperature / 100.0 + 0.5
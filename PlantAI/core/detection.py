@@ -0,0 +1,55 @@
+"""
+Description:
+    Streaming watering detection per sensor using an EWMA baseline and a one-sided CUSUM
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+from system.loader import getConfig
+
+class WateringDetector:
+    def __init__(self, alpha: float, drift: float, threshold: float, moisture: float = None):
+        self.alpha = alpha          # EWMA weight of a new reading
+        self.drift = drift          # Rise per reading tolerated as noise [%]
+        self.threshold = threshold  # Cumulative rise that counts as watering [%]
+        self.baseline = moisture    # Smoothed moisture before the current reading
+        self.cusum = 0.0
+        self.pending = False        # Previous reading crossed the threshold, waits for confirmation
+
+    def update(self, moisture: float) -> bool:
+        """
+        Returns true if the plant got watered, O(1) per reading.
+
+        The rise has to hold for a second reading, so watering is reported one reading after it started
+        (a single spike is ignored).
+        """
+        if self.baseline is None:
+            self.baseline = moisture
+            return False
+        residual = moisture - self.baseline
+
+        # Rise of the previous reading: watering if the moisture stays up, otherwise a spike
+        if self.pending:
+            self.pending = False
+            if residual > self.drift:
+                # Watering detected, start again from the new level
+                self.baseline = moisture
+                self.cusum = 0.0
+                return True
+            self.cusum = 0.0
+
+        # Sum up rises above the baseline, falling soil moisture resets the sum
+        self.cusum = max(0.0, self.cusum + residual - self.drift)
+        if self.cusum > self.threshold:
+            # Possible watering, the baseline keeps the level before the rise until the next reading
+            self.pending = True
+            return False
+
+        # Follow slow changes (drying)
+        self.baseline += self.alpha * residual
+        return False
+
+def createDetector(moisture: float = None) -> WateringDetector:
+    """Returns a detector with the settings of the config file, starting at the chosen moisture."""
+    settings = getConfig("core", "detection")
+    return WateringDetector(settings["alpha"], settings["drift"], settings["threshold"], moisture)
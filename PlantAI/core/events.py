@@ -0,0 +1,96 @@
+"""
+Description:
+    In-process publish/subscribe bus for live measurements and watering events
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import threading
+import time
+from collections import deque
+from itertools import count
+
+class Subscription:
+    """Bounded queue of one subscriber, the oldest events are dropped when it is full."""
+    def __init__(self, bus: "EventBus", maxsize: int, topics: set[str] = None, sensorId: int = None):
+        self.bus = bus
+        self.topics = topics
+        self.sensorId = sensorId
+        self.events = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def matches(self, topic: str, data: dict) -> bool:
+        """Returns True if the subscriber wants the event."""
+        if self.topics is not None and topic not in self.topics:
+            return False
+        return self.sensorId is None or data.get("sensorId") == self.sensorId
+
+    def put(self, event: dict):
+        """Adds an event without blocking the publisher."""
+        with self.condition:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append(event)
+            self.condition.notify()
+
+    def get(self, timeout: float = None) -> dict:
+        """Returns the next event (None after timeout or when closed)."""
+        with self.condition:
+            if not self.events and not self.closed:
+                self.condition.wait(timeout)
+            return self.events.popleft() if self.events else None
+
+    def close(self):
+        """Unsubscribes and wakes up a waiting reader."""
+        self.bus.unsubscribe(self)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class EventBus:
+    def __init__(self):
+        self.subscribers: list[Subscription] = []
+        self.lock = threading.Lock()
+        self.sequence = count(1)
+        self.published = 0
+
+    def subscribe(self, maxsize: int = 256, topics: set[str] = None, sensorId: int = None) -> Subscription:
+        """Returns a new subscription for the chosen topics and sensor (None = all)."""
+        entry = Subscription(self, maxsize, topics, sensorId)
+        with self.lock:
+            self.subscribers = self.subscribers + [entry]
+        return entry
+
+    def unsubscribe(self, entry: Subscription):
+        """Removes a subscription."""
+        with self.lock:
+            self.subscribers = [other for other in self.subscribers if other is not entry]
+
+    def hasSubscribers(self) -> bool:
+        return bool(self.subscribers)
+
+    def publish(self, topic: str, data: dict):
+        """Sends an event to all matching subscribers (never blocks)."""
+        event = {"id": next(self.sequence), "topic": topic, "time": time.time(), "data": data}
+        self.published += 1
+
+        # The list is replaced on (un)subscribe, so it can be read without the lock
+        for entry in self.subscribers:
+            if entry.matches(topic, data):
+                entry.put(event)
+
+    def closeAll(self):
+        """Closes all subscriptions (e.g. on shutdown)."""
+        for entry in list(self.subscribers):
+            entry.close()
+
+    def getMetrics(self) -> dict:
+        """Returns the amount of subscribers, published and dropped events."""
+        subscribers = self.subscribers
+        return {"subscribers": len(subscribers), "published": self.published,
+                "dropped": sum(entry.dropped for entry in subscribers)}
+
+# Bus of the running system (acquisition thread publishes, API streams subscribe)
+bus = EventBus()
@@ -0,0 +1,83 @@
+"""
+Description:
+    Weather features for predictions, stores hourly forecasts locally and joins them onto measurements
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+from core.models import weather
+from core.scheduler import Scheduler
+from database.adapter import DBAdapterWeather
+from system.loader import getConfig
+
+# pandas and the Open-Meteo client are loaded on first use (not needed at boot)
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Feature columns added to measurements
+weatherFeatures = ["airTemperature", "precipitation"]
+
+# Scheduler of the weather thread, separate so slow requests never delay measurements (metrics: weatherScheduler.getMetrics())
+weatherScheduler = Scheduler()
+
+def storeForecast(dbAdapter: DBAdapterWeather, location: str, data: dict) -> int:
+    """Stores the hourly temperature and precipitation of a forecast (JSON) and returns the amount."""
+    # Hourly times are local times of the forecast, convert them to epoch seconds
+    offset = data.get("utc_offset_seconds", 0)
+    hourly = data["hourly"]
+    entries = []
+    for hour, temperature, precipitation in zip(hourly["time"], hourly["temperature_2m"], hourly["precipitation"]):
+        if temperature is None or precipitation is None:
+            continue
+        timestamp = int(datetime.fromisoformat(hour).replace(tzinfo=timezone.utc).timestamp()) - offset
+        entries.append(weather(location, temperature, precipitation, timestamp))
+    return dbAdapter.insertMany(entries)
+
+def updateWeather(dbAdapter: DBAdapterWeather, location: str) -> dict:
+    """Requests the forecast of a location, stores it and returns it (JSON)."""
+    # requests and geopy are only loaded once a location is used
+    from api.OpenMeteo import getClient
+    data = getClient().getForecast(location)
+    count = storeForecast(dbAdapter, location, data)
+    logging.info(f"Stored {count} hourly weather entries for {location}.")
+    return data
+
+def refreshWeather(dbAdapter: DBAdapterWeather):
+    """Updates the weather of the configured location (if any)."""
+    location = getConfig("weather", "location")
+    if location:
+        try:
+            updateWeather(dbAdapter, location)
+        except Exception as ex:
+            logging.warning(f"Weather update failed: {ex}")
+
+def saveWeather(dbAdapter: DBAdapterWeather):
+    """Updates the weather every x seconds until stopWeather is called."""
+    weatherScheduler.every(lambda: getConfig("weather", "refreshInterval"), lambda: refreshWeather(dbAdapter), "weather")
+    weatherScheduler.run()
+
+def stopWeather(timeout: float = 10.0) -> bool:
+    """Stops updating the weather after the running update finished, returns false on timeout."""
+    return weatherScheduler.stop(timeout)
+
+def addWeather(df: "pd.DataFrame", dbAdapter: DBAdapterWeather, location: str) -> "pd.DataFrame":
+    """Returns the measurements (column timestamp) with the last known hourly weather of a location."""
+    weatherFrame = dbAdapter.getFrame(location)
+    if weatherFrame.empty:
+        return df.assign(**{feature: float("nan") for feature in weatherFeatures})
+
+    # Vectorized as-of join: last weather entry at most one hour before each measurement
+    import pandas as pd
+    df = df.sort_values("timestamp")
+    return pd.merge_asof(df, weatherFrame, on="timestamp", direction="backward", tolerance=3600)
+
+def currentWeather(dbAdapter: DBAdapterWeather, location: str, timestamp: int) -> dict:
+    """Returns the stored weather features of a location at the chosen timestamp (no network request)."""
+    entry = dbAdapter.getSingle(location, timestamp)
+    if entry is None or timestamp - entry.timestamp > 3600:
+        return {feature: float("nan") for feature in weatherFeatures}
+    return {"airTemperature": entry.temperature, "precipitation": entry.precipitation}
@@ -1,6 +1,6 @@
 """
 Description:
-    Initialize ADS1115 A/D-Converter and read moisture and temperature from truebner SMT50
+    Initialize ADS1115 A/D-Converters and read moisture and temperature from truebner SMT50
 Author: Tim Grundey
 Created: 10.10.2025
 """
@@ -8,111 +8,271 @@ Created: 10.10.2025
 import logging
 import time
 import platform
-from datetime import datetime
-from core.models import measurement
-from database.adapter import DBAdapterMeasurement
+from core.adc import ADC, ADS1115, SimulatedADC
+from core.detection import WateringDetector, createDetector
+from core.events import bus
+from core.models import measurement, sensor
+from core.scheduler import Scheduler
+from database.adapter import DBAdapterMeasurement, DBAdapterPlant, DBAdapterSensor
 from system.loader import getConfig
 
-# Constants
-format = "%Y/%m/%d %H:%M" # Timestamp format
+# One A/D-Converter per I2C address, created on first use
+devices: dict[int, ADC] = {}
 
-if "tegra" in platform.release():    
-    # Initialize ADS1115 via I2C
-    import ADS1x15
-    ads = ADS1x15.ADS1115(7, 0x48)
+# Scheduler of the acquisition thread (metrics: scheduler.getMetrics())
+scheduler = Scheduler()
 
-    # Set the max. Voltage to be measured
-    ads.setGain(ads.PGA_4_096V)
-else:
-    print(f"Sensor initialization skipped! (not running on Jetson Nano)")
+# Watering detector per sensor, keeps its state between readings
+detectors: dict[int, WateringDetector] = {}
 
-def readVoltage(channel : int) -> float:
-    """Returns the current voltage [V] of channel 0..3."""
-    # Scale raw input to voltage (0..3V)
-    return ads.toVoltage(ads.readADC(channel))
+# Adaptive sampling state per sensor (last reading, interval, next reading, statistics)
+sampling: dict[int, dict] = {}
 
-def readMoisture(cycle : int) -> float:
-    """Returns the current average volumetric water content [%]."""
+# Fallback to the single sensor of older installations is logged once (until sensors are added)
+fallbackLogged = False
+
+def getBackend() -> str:
+    """Returns the configured ADC backend, "auto" uses the ADS1115 only on the Jetson Nano."""
+    backend = getConfig("core", "adcBackend")
+    if backend == "auto":
+        backend = "ads1115" if "tegra" in platform.release() else None
+    return backend
+
+def getDevice(i2cAddress: int) -> ADC:
+    """Returns the A/D-Converter at the chosen I2C address."""
+    if i2cAddress not in devices:
+        if getBackend() == "ads1115":
+            devices[i2cAddress] = ADS1115(i2cAddress, getConfig("core", "i2cBus"))
+        else:
+            devices[i2cAddress] = SimulatedADC(i2cAddress, getConfig("simulation", "acceleration"), getConfig("simulation", "noise"))
+    return devices[i2cAddress]
+
+def getChannels(allSensors: list[sensor]) -> list[tuple[sensor, ADC, int]]:
+    """Returns every sensor with its A/D-Converter and first channel (moisture, temperature = +1)."""
+    # Without sensors in the database, read the single sensor of older installations (sensor 1 at 0x48)
+    global fallbackLogged
+    if not allSensors:
+        if not fallbackLogged:
+            logging.warning("No sensors in the database, using sensor 1 at 0x48.")
+            fallbackLogged = True
+        allSensors = [sensor(i2cAddress=0x48, sensorId=1)]
+    else:
+        fallbackLogged = False
+
+    # Each ADS1115 has 4 channels, so up to two SMT50 share one address
+    channels = []; used = {}
+    for entry in allSensors:
+        offset = used.get(entry.i2cAddress, 0)
+        if offset > 2:
+            logging.warning(f"Sensor {entry.sensorId} skipped, no free channel at {hex(entry.i2cAddress)}.")
+            continue
+        try:
+            device = getDevice(entry.i2cAddress)
+        except Exception as ex:
+            logging.error(f"Sensor {entry.sensorId} skipped, A/D-Converter at {hex(entry.i2cAddress)} not available: {ex}")
+            continue
+        used[entry.i2cAddress] = offset + 2
+        channels.append((entry, device, offset))
+
+    # Interleave A/D-Converters so consecutive reads go to different devices
+    channels.sort(key=lambda channel: channel[2])
+    return channels
+
+def toMoisture(voltage: float) -> float:
+    """Returns the volumetric water content [%] of a voltage."""
     # Scale voltage (0..3V) to volumetric water content (0..50%)
-    totalMoisture = 0.0
-    for x in range(cycle): # Return average value
-        moisture = (readVoltage(0) * 50.0) / 3.0
-        totalMoisture += moisture
-        time.sleep(1)
-    return round(totalMoisture / cycle, 2) # auf 2 Nachkommastellen runden
+    return (voltage * 50.0) / 3.0
 
-def readTemperature(cycle : int) -> float:
-    """Returns the current average temperature [°C]."""
+def toTemperature(voltage: float) -> float:
+    """Returns the temperature [°C] of a voltage."""
     # Scale voltage (0..3V) to temperature (-20..85°C)
-    totalTemperature = 0.0
+    return (voltage - 0.5) * 100.0
+
+def readSensors(channels: list[tuple[sensor, ADC, int]], cycle: int) -> dict[int, tuple[float, float]]:
+    """Returns the average moisture [%] and temperature [°C] of all sensors by sensorId (failed sensors are left out)."""
+    totals = {entry.sensorId: [0.0, 0.0] for entry, device, offset in channels}
+    pause = getConfig("core", "sampleInterval")
     for x in range(cycle): # Return average value
-        temperature = (readVoltage(1) - 0.5) * 100.0
-        totalTemperature += temperature
-        time.sleep(1)
-    return round(totalTemperature / cycle, 2) # auf 2 Nachkommastellen runden
-
-def watered(old : float, new : float) -> bool:
-    """Returns true if moisture increased significantly between old and new measurement."""
-    threshold = getConfig("core", "wateredThreshold")
-    if new - old > threshold:
-        return True
-    else:
-        return False
+        # Read all sensors once per cycle instead of waiting per sensor
+        for entry, device, offset in channels:
+            if entry.sensorId not in totals:
+                continue
+            try:
+                moisture = toMoisture(device.readVoltage(offset))
+                temperature = toTemperature(device.readVoltage(offset + 1))
+            except Exception as ex:
+                # One faulty sensor must not stop the others
+                logging.error(f"Reading sensor {entry.sensorId} at {hex(entry.i2cAddress)} failed: {ex}")
+                del totals[entry.sensorId]
+                continue
+            totals[entry.sensorId][0] += moisture
+            totals[entry.sensorId][1] += temperature
+        if x < cycle - 1:
+            time.sleep(pause)
+
+    # auf 2 Nachkommastellen runden
+    return {sensorId: (round(moisture / cycle, 2), round(temperature / cycle, 2))
+            for sensorId, (moisture, temperature) in totals.items()}
+
+def acquire(dbAdapter: DBAdapterMeasurement, channels: list[tuple[sensor, ADC, int]], cycle: int, timestamp: int = None) -> int:
+    """Reads all sensors once, checks them for watering and saves them, returns the amount of saved measurements."""
+    # Timestamp in epoch seconds
+    if timestamp is None:
+        timestamp = int(time.time())
+
+    # Read moisture and temperature from SMT50, the same samples are used for the watering check
+    return saveReadings(dbAdapter, channels, readSensors(channels, cycle), timestamp)
+
+def saveReadings(dbAdapter: DBAdapterMeasurement, channels: list[tuple[sensor, ADC, int]], readings: dict[int, tuple[float, float]],
+                 timestamp: int) -> int:
+    """Checks readings for watering and saves them, returns the amount of saved measurements."""
+    results = dict(readings)
+
+    # Check if plants got watered since last measurement
+    for entry, device, offset in channels:
+        sensorId = entry.sensorId
+        if sensorId not in results:
+            continue
+        if sensorId not in detectors:
+            # Start from the most recent saved measurement (e.g. after a restart)
+            recentMeasurement = dbAdapter.getSingle(sensor=sensorId, mode="recent")
+            detectors[sensorId] = createDetector(None if recentMeasurement is None else recentMeasurement.moisture)
+        if detectors[sensorId].update(results[sensorId][0]):
+            # The rise started with the most recent saved measurement, the drying cycle ended with the one before
+            recentMeasurements = dbAdapter.getList(sensor=sensorId, limit=2, mode="current")
+            if len(recentMeasurements) < 2:
+                logging.info(f"No recent measurement found for sensor {sensorId}. Watering ignored.")
+                continue
 
-def saveMeasurement(dbAdapter: DBAdapterMeasurement):
-    """Saves the current moisture and temperature measurements every x minutes."""
+            # Set minutes until dry for all measurements of the drying cycle (the rise stays in the new one)
+            logging.info(f"Watering detected for sensor {sensorId}.")
+            setMinutesUntilDry(dbAdapter, recentMeasurements[0])
+            bus.publish("watering", {"sensorId": sensorId, "moisture": readings[sensorId][0], "timestamp": timestamp})
+
+    # Save measurements (-1 = non-archived entry)
+    if not results:
+        return 0
+    saved = dbAdapter.insertMany(measurement(sensorId, moisture, temperature, -1, timestamp)
+                                 for sensorId, (moisture, temperature) in results.items())
+
+    # Notify live subscribers (e.g. API streams) after the commit
+    if bus.hasSubscribers():
+        for sensorId, (moisture, temperature) in results.items():
+            bus.publish("measurement", {"sensorId": sensorId, "moisture": moisture, "temperature": temperature,
+                                        "timestamp": timestamp})
+    return saved
+
+def updateSampling(readings: dict[int, tuple[float, float]], minMoisture: dict[int, float], now: float):
+    """Sets the next reading of every sensor depending on the change of moisture and temperature."""
+    settings = getConfig("core", "adaptive")
+    for sensorId, (moisture, temperature) in readings.items():
+        state = sampling.setdefault(sensorId, {"samples": 0, "fast": 0, "intervalSum": 0.0, "interval": settings["minInterval"]})
+
+        # Change per hour since last reading (changes within the sensor noise don't count)
+        fast = False
+        if "time" in state and now > state["time"]:
+            hours = (now - state["time"]) / 3600.0
+            moistureChange = abs(moisture - state["moisture"])
+            temperatureChange = abs(temperature - state["temperature"])
+            fast = ((moistureChange > settings["moistureNoise"] and moistureChange / hours >= settings["moistureRate"])
+                    or (temperatureChange > settings["temperatureNoise"] and temperatureChange / hours >= settings["temperatureRate"]))
+            state["intervalSum"] += now - state["time"]
+
+        # Read often if soil is almost dry
+        if sensorId in minMoisture and moisture - minMoisture[sensorId] <= settings["proximity"]:
+            fast = True
+
+        # Fast changes: shortest interval, otherwise double interval up to the longest
+        if fast:
+            state["interval"] = settings["minInterval"]
+            state["fast"] += 1
+        else:
+            state["interval"] = min(state["interval"] * 2, settings["maxInterval"])
+        state.update(moisture=moisture, temperature=temperature, time=now, due=now + state["interval"])
+        state["samples"] += 1
+
+def getSamplingStats() -> dict[int, dict]:
+    """Returns readings, current and mean interval [s] and share of fast readings per sensor."""
+    return {sensorId: {
+                "samples": state["samples"],
+                "interval": state["interval"],
+                "meanInterval": state["intervalSum"] / (state["samples"] - 1) if state["samples"] > 1 else 0.0,
+                "fastShare": state["fast"] / state["samples"],
+            } for sensorId, state in sampling.items()}
+
+def pruneMeasurements(dbAdapter: DBAdapterMeasurement) -> int:
+    """Deletes archived measurements older than the retention period and returns the amount."""
+    retentionDays = getConfig("database", "retentionDays")
+    if retentionDays <= 0:
+        return 0
+    count = dbAdapter.prune(retentionDays)
+    logging.info(f"Pruned {count} measurements older than {retentionDays} days.")
+    return count
+
+def measureTick(dbAdapter: DBAdapterMeasurement, dbAdapterSensor: DBAdapterSensor, dbAdapterPlant: DBAdapterPlant):
+    """Saves (interval, adaptive) or prints (debug) the current measurements of all (due) sensors once."""
+    # Check if reading mode is interval, adaptive or debug
+    mode = getConfig("core", "readMode")
+    channels = getChannels(dbAdapterSensor.getList())
+    if mode == "interval":
+        acquire(dbAdapter, channels, 5)
+    elif mode == "adaptive":
+        # Only read sensors whose next reading is due (within half a tick)
+        now = time.monotonic()
+        tolerance = getInterval() / 2
+        channels = [channel for channel in channels if sampling.get(channel[0].sensorId, {}).get("due", 0.0) <= now + tolerance]
+        if channels:
+            timestamp = int(time.time())
+            readings = readSensors(channels, 5)
+            saveReadings(dbAdapter, channels, readings, timestamp)
+            minMoisture = {entry.sensorId: float(kind.minMoisture) for entry, kind in dbAdapterPlant.getListWithSpecies()}
+            updateSampling(readings, minMoisture, now)
+    elif mode == "debug":
+        # Print data directly
+        for sensorId, (moisture, temperature) in readSensors(channels, 1).items():
+            print(f"Sensor {sensorId} - Moisture: {moisture}%, Temperature: {temperature}°C")
+
+def getInterval() -> float:
+    """Returns the seconds between two ticks (1 second in debug mode, shortest interval in adaptive mode)."""
+    mode = getConfig("core", "readMode")
+    if mode == "debug":
+        return 1.0
+    elif mode == "adaptive":
+        return getConfig("core", "adaptive")["minInterval"]
+    return getConfig("core", "readIntervalSensors")
+
+def addTasks(scheduler: Scheduler, dbAdapter: DBAdapterMeasurement, dbAdapterSensor: DBAdapterSensor, dbAdapterPlant: DBAdapterPlant):
+    """Adds the measurement and retention tasks to a scheduler."""
+    scheduler.every(getInterval, lambda: measureTick(dbAdapter, dbAdapterSensor, dbAdapterPlant), "measurements")
+    scheduler.every(86400, lambda: pruneMeasurements(dbAdapter), "retention")
+
+def saveMeasurement(dbAdapter: DBAdapterMeasurement, dbAdapterSensor: DBAdapterSensor, dbAdapterPlant: DBAdapterPlant):
+    """Saves the current moisture and temperature measurements of all sensors every x minutes."""
     # Skip reading sensor data if not running on Jetson Nano
-    if "tegra" in platform.release():
-        while True:
-            # Check if reading mode is interval or debug
-            mode = getConfig("core", "readMode")
-            if mode == "interval":
-                # Wait until reading
-                sleep = getConfig("core", "readIntervalSensors")
-                time.sleep(sleep)
-
-                # Check if recent measurement exists
-                skipInsert = False
-                recentMeasurement = dbAdapter.getSingle(sensor=1, mode="recent")
-                if recentMeasurement is None:
-                    logging.info("No recent measurement found. Watering check skipped.")
-                # Check if plant got watered since last measurement
-                elif watered(recentMeasurement.moisture, readMoisture(1)):
-                    # Set minutes until dry for all previous measurements
-                    logging.info("Watering detected.")
-                    setMinutesUntilDry(dbAdapter, recentMeasurement)
-                    skipInsert = True
-
-                # Skip insert after minutes until dry were set
-                if not skipInsert:
-                    # Format timestamp
-                    now = datetime.now()
-                    timestamp = now.strftime(format)
-
-                    # Read moisture and temperature from SMT50 (-1 = non-archived entry)
-                    dbAdapter.insert(measurement(1, readMoisture(5), readTemperature(5), -1, timestamp))
-            elif mode == "debug":
-                # Print data directly
-                print(f"Sensor - Moisture: {readVoltage(0):.2f}V = {readMoisture(1)}%, Temperature: {readVoltage(1):.2f}V = {readTemperature(1)}°C")
-                
-                # Wait until next reading
-                time.sleep(1)
+    if getBackend() is None:
+        print(f"Sensor initialization skipped! (not running on Jetson Nano)")
+        return
 
-def setMinutesUntilDry(dbAdapter: DBAdapterMeasurement, recentMeasurement : measurement):
-    """Set Minutes until Dry for all non-archived measurements."""
-    # Format recent timestamp
-    recentTime = datetime.strptime(recentMeasurement.timestamp, format)
+    # Fixed-rate ticks on a monotonic clock until stopMeasurement is called
+    addTasks(scheduler, dbAdapter, dbAdapterSensor, dbAdapterPlant)
+    scheduler.run()
+
+async def saveMeasurementAsync(dbAdapter: DBAdapterMeasurement, dbAdapterSensor: DBAdapterSensor, dbAdapterPlant: DBAdapterPlant):
+    """Same as saveMeasurement, but runs in the asyncio event loop (other tasks can be added to the scheduler)."""
+    if getBackend() is None:
+        print(f"Sensor initialization skipped! (not running on Jetson Nano)")
+        return
+    addTasks(scheduler, dbAdapter, dbAdapterSensor, dbAdapterPlant)
+    await scheduler.runAsync()
 
-    for entry in dbAdapter.getList(sensor=1, limit=-1, mode="current"):
-        # Format current timestamp
-        actTime = datetime.strptime(entry.timestamp, format)
+def stopMeasurement(timeout: float = 10.0) -> bool:
+    """Stops saving measurements after the running measurement finished, returns false on timeout."""
+    return scheduler.stop(timeout)
 
-        # Calculate minutes until dry
-        sekUntilDry = recentTime - actTime
-        minUntilDry = sekUntilDry.total_seconds() / 60.0
+def setMinutesUntilDry(dbAdapter: DBAdapterMeasurement, recentMeasurement : measurement):
+    """Set Minutes until Dry for all non-archived measurements up to the recent measurement."""
+    # Calculate minutes until dry relative to the recent measurement in one statement
+    dbAdapter.updateMinutesUntilDry(recentMeasurement.sensorId, recentMeasurement.timestamp)
 
-        # Update every measurement
-        dbAdapter.update(entry.measureId, minUntilDry)
-            
     # Logging
-    logging.info("Minutes until dry set.")
\ No newline at end of file
+    logging.info("Minutes until dry set.")
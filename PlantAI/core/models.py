@@ -5,6 +5,14 @@ Author: Tim Grundey
 Created: 25.09.2025
 """
 
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Iterable
+
+# Constants
+timeFormat = "%Y/%m/%d %H:%M" # Timestamp format for display and CSV files
+
 class plant:
     def __init__(self, name: str, speciesId: int, sensorId: int, plantId: int = 0):
         self.plantId = plantId
@@ -33,7 +41,9 @@ class sensor:
         return f"[{self.sensorId} | {self.i2cAddress}]"
     
 class measurement:
-    def __init__(self, sensorId: int, moisture: float, temperature: float, minUntilDry: int, timestamp: str, measureId: int = 0):
+    __slots__ = ("measureId", "sensorId", "moisture", "temperature", "minUntilDry", "timestamp")
+
+    def __init__(self, sensorId: int, moisture: float, temperature: float, minUntilDry: int, timestamp: int, measureId: int = 0):
         self.measureId = measureId
         self.sensorId = sensorId
         self.moisture = moisture
@@ -42,5 +52,74 @@ class measurement:
         self.timestamp = timestamp
     
     def __str__(self) -> str:
-        return f"[{self.measureId} | {self.sensorId} | {self.moisture:.2f} | {self.temperature:.2f} | {self.minUntilDry} | {self.timestamp}]"
-        
\ No newline at end of file
+        return f"[{self.measureId} | {self.sensorId} | {self.moisture:.2f} | {self.temperature:.2f} | {self.minUntilDry} | {datetime.fromtimestamp(self.timestamp).strftime(timeFormat)}]"
+
+class weather:
+    def __init__(self, location: str, temperature: float, precipitation: float, timestamp: int):
+        self.location = location
+        self.temperature = temperature
+        self.precipitation = precipitation
+        self.timestamp = timestamp
+
+    def __str__(self) -> str:
+        return f"[{self.location} | {self.temperature:.1f} | {self.precipitation:.1f} | {datetime.fromtimestamp(self.timestamp).strftime(timeFormat)}]"
+
+class measurementSeries:
+    # Column names and their array type codes (q = 64-bit integer, d = double)
+    columns = {"measureId": "q", "sensorId": "q", "moisture": "d", "temperature": "d", "minUntilDry": "q", "timestamp": "q"}
+    __slots__ = tuple(columns)
+
+    def __init__(self, **columns: Iterable):
+        for name, typecode in measurementSeries.columns.items():
+            setattr(self, name, array(typecode, columns.get(name, ())))
+
+    @classmethod
+    def fromRows(cls, rows: Iterable[tuple]) -> "measurementSeries":
+        """Returns a series of rows in table order (measureId, sensorId, moisture, temperature, minUntilDry, timestamp)."""
+        series = cls()
+        for row in rows:
+            series.appendRow(row)
+        return series
+
+    def appendRow(self, row: tuple):
+        """Appends a row in table order."""
+        for name, value in zip(measurementSeries.columns, row):
+            getattr(self, name).append(value)
+
+    def append(self, entry: measurement):
+        """Appends a measurement."""
+        self.appendRow((entry.measureId, entry.sensorId, entry.moisture, entry.temperature, entry.minUntilDry, entry.timestamp))
+
+    def sensor(self, sensorId: int) -> "measurementSeries":
+        """
+        Returns a read-only view of the measurements of one sensor (no copy of the columns).
+
+        The series must be grouped by sensor (e.g. from getSeries) and can't grow while views exist.
+        """
+        start = bisect_left(self.sensorId, sensorId)
+        end = bisect_right(self.sensorId, sensorId)
+        view = measurementSeries.__new__(measurementSeries)
+        for name in measurementSeries.columns:
+            setattr(view, name, memoryview(getattr(self, name))[start:end])
+        return view
+
+    def nbytes(self) -> int:
+        """Returns the memory used by the column buffers."""
+        return sum(memoryview(getattr(self, name)).nbytes for name in measurementSeries.columns)
+
+    def __len__(self) -> int:
+        return len(self.measureId)
+
+    def __getitem__(self, index):
+        # Slices return a series, single indices a measurement
+        if isinstance(index, slice):
+            return measurementSeries(**{name: getattr(self, name)[index] for name in measurementSeries.columns})
+        return measurement(measureId=self.measureId[index], sensorId=self.sensorId[index], moisture=self.moisture[index],
+                           temperature=self.temperature[index], minUntilDry=self.minUntilDry[index], timestamp=self.timestamp[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __str__(self) -> str:
+        return f"[{len(self)} measurements | {len(set(self.sensorId))} sensors]"
@@ -5,56 +5,326 @@ Author: Tim Grundey
 Created: 31.10.2025
 """
 
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import joblib
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.isotonic import IsotonicRegression
+from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.pipeline import Pipeline
-from core.models import measurement
-
-def hoursUntilDry(allMeasurements: list[measurement]) -> int:
-    """Returns a date when the plant has to be watered again based on predictions."""
-    # Fill lists with data
-    listMinUntilDry = []; listMoisture = []
-    for measurement in allMeasurements:
-        listMinUntilDry.append(measurement.minUntilDry)
-        listMoisture.append(measurement.moisture)
-
-    # Create dictionary from lists
-    data = {
-        'minUntilDry': listMinUntilDry,
-        'moisture': listMoisture
-    }
-
-    # Convert List into DataFrame and prepare features
-    df = pd.DataFrame(data)
-    X = df[['moisture']]
-    y = df['minUntilDry']
-
-    # Split training and test data (80/20)
-    # random_state makes sure the data is always mixed the same way (only for testing)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, test_size=0.2, random_state=42)
-
-    # Create pipeline with random forest model
-    pipe = Pipeline([
-        ('model', RandomForestRegressor())
+from core.features import addWeather, currentWeather, weatherFeatures
+from database.adapter import DBAdapterMeasurement, DBAdapterWeather
+from system.loader import getConfig
+
+# Trained models per sensor: {"model": Pipeline, "lastArchived": timestamp of newest training data, "features": columns,
+# "name": model type, "scores": cross-validated MAE per model type (auto selection only),
+# "moistureMin": lowest archived moisture, "curve": exponential drying curve for extrapolation below moistureMin,
+# "configured": model type from the config file, "location": weather location the features were chosen for}
+models: dict[int, dict] = {}
+lock = threading.Lock()
+dbAdapterWeather = DBAdapterWeather()
+
+# Evaluations by data hash, plots being rendered by path (rendered in one background thread)
+evaluations: dict[str, dict] = {}
+maxEvaluations = 16
+renders: dict[str, Future] = {}
+renderer: ThreadPoolExecutor = None
+evaluationLock = threading.Lock()
+
+def getFeatures(dbAdapter: DBAdapterMeasurement, sensor: int) -> tuple[pd.DataFrame, list[str]]:
+    """Returns the archived measurements of a sensor with weather (if stored) and the feature columns."""
+    df = dbAdapter.getFrame(sensor=sensor, mode="archived", columns=("moisture", "minUntilDry", "timestamp"))
+
+    # Join stored weather of the configured location (no network request)
+    location = getConfig("weather", "location")
+    if location:
+        df = addWeather(df, dbAdapterWeather, location)
+        if df[weatherFeatures].notna().any().all():
+            return df, ['moisture'] + weatherFeatures
+    return df, ['moisture']
+
+class ExponentialDecayRegressor(RegressorMixin, BaseEstimator):
+    """
+    Inverse of an exponential drying curve moisture = c + e^((t - a) / b): minutes until dry = a + b * ln(moisture - c).
+
+    Uses the first feature (moisture) only. For every candidate offset c below the lowest moisture, a and b are
+    solved with linear least squares, the offset with the smallest error is kept.
+    """
+    def __init__(self, offsets: int = 20):
+        self.offsets = offsets
+
+    def fit(self, X, y):
+        moisture = np.asarray(X, dtype=float)[:, 0]
+        y = np.asarray(y, dtype=float)
+        low = moisture.min()
+        span = max(moisture.max() - low, 1e-6)
+        best = None
+        for c in low - span * np.geomspace(1e-3, 10, self.offsets):
+            A = np.column_stack([np.ones_like(moisture), np.log(moisture - c)])
+            coef = np.linalg.lstsq(A, y, rcond=None)[0]
+            error = np.sum((A @ coef - y) ** 2)
+            if best is None or error < best[0]:
+                best = (error, c, coef)
+        self.c_, (self.a_, self.b_) = best[1], best[2]
+        return self
+
+    def predict(self, X):
+        moisture = np.asarray(X, dtype=float)[:, 0]
+        return np.maximum(0.0, self.a_ + self.b_ * np.log(np.maximum(moisture - self.c_, 1e-9)))
+
+    def curve(self, moisture) -> np.ndarray:
+        """Returns the fitted curve without clipping (also below the training data, NaN at or below the offset c)."""
+        moisture = np.asarray(moisture, dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(moisture > self.c_, self.a_ + self.b_ * np.log(moisture - self.c_), np.nan)
+
+def moistureOnly(model) -> Pipeline:
+    """Returns a pipeline that trains the model with the moisture column only."""
+    return Pipeline([
+        ('moisture', ColumnTransformer([('moisture', 'passthrough', ['moisture'])])),
+        ('model', model)
     ])
 
+# Available model types (hours without stored weather stay NaN, forest and boosting handle missing values)
+modelTypes = {
+    "forest": lambda: Pipeline([('model', RandomForestRegressor(n_jobs=getConfig("predictions", "nJobs")))]),
+    "boosting": lambda: Pipeline([('model', HistGradientBoostingRegressor())]),
+    "isotonic": lambda: moistureOnly(IsotonicRegression(out_of_bounds="clip")),
+    "exponential": lambda: moistureOnly(ExponentialDecayRegressor()),
+}
+
+def trainModel(df: pd.DataFrame, features: list[str] = ['moisture'], name: str = "forest") -> Pipeline:
+    """Returns a model of the chosen type trained with all archived measurements (columns features, minUntilDry)."""
+    pipe = modelTypes[name]()
+    pipe.fit(df[features], df['minUntilDry'])
+    return pipe
+
+def scoreModels(df: pd.DataFrame, features: list[str] = ['moisture'], folds: int = 3) -> dict[str, float]:
+    """Returns the mean absolute error of every model type (time-series cross-validation: always tested on newer cycles)."""
+    df = df.sort_values("timestamp") if "timestamp" in df else df
+    scores = {}
+    for name in modelTypes:
+        errors = []
+        for train, test in TimeSeriesSplit(n_splits=folds).split(df):
+            pipe = trainModel(df.iloc[train], features, name)
+            errors.append(mean_absolute_error(df['minUntilDry'].iloc[test], pipe.predict(df[features].iloc[test])))
+        scores[name] = float(np.mean(errors))
+    return scores
+
+def selectModel(df: pd.DataFrame, features: list[str] = ['moisture']) -> tuple[str, dict[str, float]]:
+    """Returns the model type with the smallest cross-validated error and the errors of all types."""
+    # Too few measurements for cross-validation: keep the random forest
+    folds = getConfig("predictions", "folds")
+    if len(df) < (folds + 1) * 10:
+        return "forest", {}
+    scores = scoreModels(df, features, folds)
+    return min(scores, key=scores.get), scores
+
+def getModel(dbAdapter: DBAdapterMeasurement, sensor: int) -> dict:
+    """Returns the model entry of a sensor, retrains only if new drying cycles were archived or the configuration changed."""
+    lastArchived = dbAdapter.getLastArchived(sensor)
+    if lastArchived is None:
+        return None
+
+    with lock:
+        # Load stored model on first use (a damaged file is retrained)
+        path = os.path.join(getConfig("predictions", "modelPath"), f"sensor{sensor}.joblib")
+        if sensor not in models and os.path.exists(path):
+            try:
+                models[sensor] = joblib.load(path)
+            except Exception as ex:
+                logging.warning(f"Stored model for sensor {sensor} could not be loaded, retraining: {ex}")
+
+        # Retrain and store model if new archived measurements exist or the model type or weather location changed
+        configured, location = getConfig("predictions", "model"), getConfig("weather", "location")
+        entry = models.get(sensor, {})
+        if (entry.get("lastArchived") != lastArchived or "curve" not in entry
+                or entry.get("configured") != configured or entry.get("location") != location):
+            df, features = getFeatures(dbAdapter, sensor)
+
+            # Fixed model type or automatic selection per sensor
+            name, scores = configured, {}
+            if name == "auto":
+                name, scores = selectModel(df, features)
+            model = trainModel(df, features, name)
+            curve = ExponentialDecayRegressor().fit(df[['moisture']], df['minUntilDry'])
+            models[sensor] = {"model": model, "lastArchived": lastArchived, "features": features, "name": name, "scores": scores,
+                              "moistureMin": float(df['moisture'].min()), "curve": curve, "configured": configured, "location": location}
+            # Write to a temporary file first (one per process), readers never see half a model
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            joblib.dump(models[sensor], temporary)
+            os.replace(temporary, path)
+            logging.info(f"Model for sensor {sensor} trained ({name}).")
+        return models[sensor]
+
+def predictEntry(entry: dict, moistures: list[float]) -> list[float]:
+    """Returns the predictions of a model entry for many moisture values (one model call)."""
+    # Weather features are read from the local store (the same for every row)
+    df = pd.DataFrame({'moisture': moistures})
+    if len(entry["features"]) > 1:
+        df = df.assign(**currentWeather(dbAdapterWeather, getConfig("weather", "location"), int(time.time())))
+    return entry["model"].predict(df[entry["features"]]).tolist()
+
+def predictMany(dbAdapter: DBAdapterMeasurement, sensor: int, moistures: list[float]) -> list[float]:
+    """Returns the predicted minutes until dry for many moisture values of a sensor (one model call)."""
+    entry = getModel(dbAdapter, sensor)
+    if entry is None:
+        return None
+    return predictEntry(entry, moistures)
+
+def minutesUntilMoisture(dbAdapter: DBAdapterMeasurement, sensor: int, moisture: float, targets: list[float]) -> list[tuple[float, bool]]:
+    """
+    Returns the minutes from moisture until each target moisture is reached and whether it was extrapolated.
+
+    Targets within the archived moisture range use the model (minutes until dry now - at the target). The model
+    predicts no further drying below the lowest archived moisture, there the exponential drying curve is
+    extrapolated instead (None if the curve never reaches the target).
+    """
+    entry = getModel(dbAdapter, sensor)
+    if entry is None:
+        return None
+    low = entry["moistureMin"]
+    predictions = predictEntry(entry, [moisture, low] + list(targets))
+    now, atLow = predictions[0], predictions[1]
+
+    results = []
+    for target, predicted in zip(targets, predictions[2:]):
+        if target >= low:
+            results.append((max(0.0, now - predicted), False))
+            continue
+
+        # Model until the lowest archived moisture, exponential curve from there on
+        start = min(moisture, low)
+        beyond = entry["curve"].curve([start, target])
+        if np.isnan(beyond).any():
+            results.append((None, True))
+        else:
+            results.append((max(0.0, now - atLow) + max(0.0, float(beyond[0] - beyond[1])), True))
+    return results
+
+def minutesUntilDry(dbAdapter: DBAdapterMeasurement, sensor: int, moisture: float = None) -> float:
+    """Returns the predicted minutes until dry for the current (or chosen) moisture."""
+    # Use most recent measurement if no moisture was chosen
+    if moisture is None:
+        recentMeasurement = dbAdapter.getSingle(sensor=sensor, mode="recent")
+        if recentMeasurement is None:
+            return None
+        moisture = recentMeasurement.moisture
+
+    predictions = predictMany(dbAdapter, sensor, [moisture])
+    return None if predictions is None else predictions[0]
+
+def evaluateModel(df: pd.DataFrame, features: list[str] = ['moisture'], name: str = "forest") -> dict:
+    """
+    Trains a model of the chosen type with the oldest 80% of the archived measurements and returns the
+    predictions and metrics of the newest 20% (columns features, minUntilDry, timestamp).
+    """
+    # Split training and test data in time (80/20): always tested on newer measurements, like the running model
+    if len(df) < 10:
+        raise ValueError(f"{len(df)} archived measurements, at least 10 needed.")
+    df = df.sort_values("timestamp", kind="stable")
+    split = int(len(df) * 0.8)
+    train, test = df.iloc[:split], df.iloc[split:]
+
+    # Same model type as the sensor's model, fixed seed (same data = same result in every worker)
+    pipe = modelTypes[name]()
+    if "random_state" in pipe.named_steps['model'].get_params():
+        pipe.set_params(model__random_state=0)
+
     # Train model with data
-    pipe.fit(X_train, y_train)
-    y_pred = pipe.predict(X_test)
+    pipe.fit(train[features], train['minUntilDry'])
+    y_pred = pipe.predict(test[features])
+
+    # Evaluation (plain lists, results are sent between processes)
+    return {"model": name, "trainMoisture": train['moisture'].tolist(), "trainMinutes": train['minUntilDry'].tolist(),
+            "testMoisture": test['moisture'].tolist(), "predictions": y_pred.tolist(),
+            "mae": mean_absolute_error(test['minUntilDry'], y_pred), "r2": r2_score(test['minUntilDry'], y_pred)}
+
+def dataHash(df: pd.DataFrame, *extra: str) -> str:
+    """Returns a hash of the content of a DataFrame and extra strings (same data = same hash)."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    for value in extra:
+        digest.update(value.encode())
+    return digest.hexdigest()
+
+def drawPlot(evaluation: dict, path: str):
+    """Saves the evaluation as scatter plot (format from the file extension, e.g. .png or .svg)."""
+    # Figure without pyplot: Agg canvas, no window and no global state (safe in background threads)
+    from matplotlib.figure import Figure
+    figure = Figure()
+    axes = figure.subplots()
+    axes.set_title("Predictions (using X test values)")
+    axes.scatter(evaluation['trainMoisture'], evaluation['trainMinutes'])
+    axes.scatter(evaluation['testMoisture'], evaluation['predictions'], c='m')
+    axes.set_ylabel("Minutes until dry")
+    axes.set_xlabel("Moisture")
+
+    # Write to a temporary file first, readers never see half a plot
+    temporary = f"{path}.tmp"
+    figure.savefig(temporary, format=os.path.splitext(path)[1][1:])
+    os.replace(temporary, path)
 
-    # Evaluation
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-    print(f"Prediction: {y_pred}")
-    print(f"MAE: {mae:.3f}, R²: {r2:.3f}")
+def renderPlot(evaluation: dict, directory: str, format: str = "png") -> str:
+    """Renders the plot of an evaluation in a background thread and returns its path (already rendered plots are reused)."""
+    global renderer
+    path = os.path.join(directory, f"evaluation-{evaluation['hash'][:16]}.{format}")
+    with evaluationLock:
+        if os.path.exists(path) or path in renders:
+            return path
+        if renderer is None:
+            renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        os.makedirs(directory, exist_ok=True)
+        future = renders[path] = renderer.submit(drawPlot, evaluation, path)
 
-    # Visualisation
+    def finished(done: Future):
+        renders.pop(path, None)
+        if done.exception() is not None:
+            logging.error(f"Plot {path} could not be rendered: {done.exception()}")
+    future.add_done_callback(finished)
+    return path
+
+def showEvaluation(evaluation: dict):
+    """Shows the plot of an evaluation in a window (blocks until it is closed, needs a display)."""
+    import matplotlib.pyplot as plt
     plt.title("Predictions (using X test values)")
-    plt.scatter(X_train, y_train)
-    plt.scatter(X_test, y_pred, c='m')
+    plt.scatter(evaluation['trainMoisture'], evaluation['trainMinutes'])
+    plt.scatter(evaluation['testMoisture'], evaluation['predictions'], c='m')
     plt.ylabel("Minutes until dry")
     plt.xlabel("Moisture")
     plt.show()
+
+def hoursUntilDry(df: pd.DataFrame, features: list[str] = ['moisture'], name: str = "forest", plotPath: str = None,
+                  plotFormat: str = "png") -> dict:
+    """
+    Returns the evaluation of a model trained with the oldest 80% of the archived measurements (see evaluateModel).
+
+    Keys: model, predictions, mae, r2, hash (of the data and model type), training and test values, plot (path, only
+    with plotPath). Results are cached by hash, evaluating unchanged data again costs nothing. With plotPath the plot
+    is rendered there in a background thread (Agg, png or svg).
+    """
+    key = dataHash(df[features + ['minUntilDry', 'timestamp']], name, *features)
+    with evaluationLock:
+        evaluation = evaluations.get(key)
+    if evaluation is None:
+        evaluation = dict(evaluateModel(df, features, name), hash=key)
+        with evaluationLock:
+            evaluations[key] = evaluation
+            # Keep only the newest evaluations
+            while len(evaluations) > maxEvaluations:
+                del evaluations[next(iter(evaluations))]
+
+    # Plot file (rendered once per hash and format)
+    evaluation = dict(evaluation)
+    if plotPath:
+        evaluation["plot"] = renderPlot(evaluation, plotPath, plotFormat)
+    return evaluation
@@ -0,0 +1,151 @@
+"""
+Description:
+    Fixed-rate scheduler for periodic tasks on a monotonic clock, with jitter and drift metrics
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable
+
+# Interval in seconds of a task whose interval function failed before it was ever read
+fallbackInterval = 60.0
+
+class PeriodicTask:
+    def __init__(self, name: str, interval: Callable[[], float], function: Callable[[], None]):
+        self.name = name
+        self.interval = interval
+        self.function = function
+        self.start = None  # Anchor of the fixed-rate ticks
+        self.period = None
+        self.tick = 0
+
+        # Metrics: lateness = actual start - scheduled start of a tick
+        self.runs = 0
+        self.missed = 0
+        self.latenessLast = 0.0
+        self.latenessMax = 0.0
+        self.latenessMean = 0.0
+        self.latenessSquares = 0.0
+        self.durationLast = 0.0
+
+    def nextDue(self, now: float) -> float:
+        """Returns the monotonic time of the next tick."""
+        # Keep the last interval if it can't be read (e.g. broken config file)
+        try:
+            period = self.interval()
+        except Exception:
+            logging.exception(f"Interval of task {self.name} failed.")
+            period = self.period if self.period is not None else fallbackInterval
+
+        # Re-anchor on first use or if the interval changed (e.g. config reloaded)
+        if self.start is None or period != self.period:
+            self.start, self.period, self.tick = now, period, 0
+        return self.start + self.tick * self.period
+
+    def run(self, scheduled: float):
+        """Runs the task once and updates the metrics."""
+        started = time.monotonic()
+        try:
+            self.function()
+        except Exception:
+            logging.exception(f"Task {self.name} failed.")
+        finished = time.monotonic()
+
+        # Update lateness statistics (Welford)
+        self.runs += 1
+        lateness = started - scheduled
+        delta = lateness - self.latenessMean
+        self.latenessMean += delta / self.runs
+        self.latenessSquares += delta * (lateness - self.latenessMean)
+        self.latenessLast = lateness
+        self.latenessMax = max(self.latenessMax, lateness)
+        self.durationLast = finished - started
+
+        # Fixed rate: next tick stays on the grid, ticks that already passed are skipped
+        ticks = int((finished - self.start) // self.period) + 1
+        self.missed += max(0, ticks - self.tick - 1)
+        self.tick = max(self.tick + 1, ticks)
+
+    def getMetrics(self) -> dict:
+        """Returns run count, missed ticks, lateness (drift) and jitter in seconds."""
+        return {
+            "interval": self.period,
+            "runs": self.runs,
+            "missed": self.missed,
+            "latenessLast": self.latenessLast,
+            "latenessMean": self.latenessMean,
+            "latenessMax": self.latenessMax,
+            "jitter": (self.latenessSquares / self.runs) ** 0.5 if self.runs else 0.0,
+            "durationLast": self.durationLast,
+        }
+
+class Scheduler:
+    def __init__(self):
+        self.tasks: list[PeriodicTask] = []
+        self.stopEvent = threading.Event()
+        self.stopped = threading.Event()
+        self.stopped.set()
+
+    def every(self, interval, function: Callable[[], None], name: str):
+        """Adds a task running every interval seconds (number or function returning the current interval)."""
+        if not callable(interval):
+            seconds = interval
+            interval = lambda: seconds
+        self.tasks.append(PeriodicTask(name, interval, function))
+
+    def run(self):
+        """Runs all tasks in the current thread until stop is called."""
+        self.stopEvent.clear(); self.stopped.clear()
+        try:
+            # Nothing to run: wait for stop
+            if not self.tasks:
+                self.stopEvent.wait()
+            while not self.stopEvent.is_set():
+                # Run the task that is due first, wait until then (stop wakes up immediately)
+                now = time.monotonic()
+                due, task = min(((task.nextDue(now), task) for task in self.tasks), key=lambda entry: entry[0])
+                if self.stopEvent.wait(max(0.0, due - now)):
+                    break
+                task.run(due)
+        finally:
+            self.stopped.set()
+
+    async def runAsync(self):
+        """Runs all tasks in the running asyncio event loop until stop is called, blocking tasks run in the executor."""
+        self.stopEvent.clear(); self.stopped.clear()
+        loop = asyncio.get_running_loop()
+
+        async def runTask(task: PeriodicTask):
+            while not self.stopEvent.is_set():
+                now = time.monotonic()
+                due = task.nextDue(now)
+                if due > now:
+                    # Sleep in short steps so stop is noticed
+                    await asyncio.sleep(min(due - now, 0.5))
+                    continue
+                await loop.run_in_executor(None, task.run, due)
+
+        async def waitForStop():
+            while not self.stopEvent.is_set():
+                await asyncio.sleep(0.5)
+
+        try:
+            if self.tasks:
+                await asyncio.gather(*(runTask(task) for task in self.tasks))
+            else:
+                await waitForStop()
+        finally:
+            self.stopped.set()
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """Stops all tasks and waits until the running task finished, returns false on timeout."""
+        self.stopEvent.set()
+        return self.stopped.wait(timeout)
+
+    def getMetrics(self) -> dict[str, dict]:
+        """Returns the metrics of all tasks by name."""
+        return {task.name: task.getMetrics() for task in self.tasks}
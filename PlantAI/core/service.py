@@ -0,0 +1,246 @@
+"""
+Description:
+    Runs model training and predictions in separate processes, so they never compete with the sensor thread
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from database import connector
+from database.adapter import DBAdapterMeasurement, DBAdapterPlant
+from system import loader
+from system.loader import getConfig
+
+def initWorker(configPath: str, dbPath: str, nice: int):
+    """Prepares a worker process (same config and database as the main process, nJobs threads, lower CPU priority)."""
+    loader.path = configPath
+    connector.dbPath = dbPath
+
+    # Native thread pools (OpenMP of boosting, BLAS) follow nJobs too, set before scikit-learn is loaded
+    nJobs = getConfig("predictions", "nJobs")
+    if nJobs > 0:
+        for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+            os.environ[name] = str(nJobs)
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+
+def predictInWorker(sensor: int, moisture: float) -> float:
+    """Returns the minutes until dry, models stay cached in the worker process."""
+    # scikit-learn and pandas are only loaded in the workers
+    from core.predictions import minutesUntilDry
+    return minutesUntilDry(DBAdapterMeasurement(), sensor, moisture)
+
+def minutesUntilMoistureInWorker(sensor: int, moisture: float, targets: list[float]) -> list[tuple[float, bool]]:
+    """Returns the minutes from moisture until each target moisture of a sensor and whether it was extrapolated."""
+    from core.predictions import minutesUntilMoisture
+    return minutesUntilMoisture(DBAdapterMeasurement(), sensor, moisture, targets)
+
+def evaluateInWorker(sensor: int) -> dict:
+    """Returns the evaluation of the sensor's model type trained with the oldest 80% of the archived measurements, renders its plot (if configured)."""
+    from core.predictions import getFeatures, getModel, hoursUntilDry
+    dbAdapter = DBAdapterMeasurement()
+    entry = getModel(dbAdapter, sensor)
+    if entry is None:
+        raise ValueError(f"No archived measurements for sensor {sensor}.")
+    df, _ = getFeatures(dbAdapter, sensor)
+    return hoursUntilDry(df, entry["features"], entry["name"], getConfig("predictions", "plotPath"), getConfig("predictions", "plotFormat"))
+
+class PredictionService:
+    def __init__(self, workers: int = None):
+        self.workers = getConfig("predictions", "workers") if workers is None else workers
+        self.executor: ProcessPoolExecutor = None
+        self.dbAdapter = DBAdapterMeasurement()
+        self.dbAdapterPlant = DBAdapterPlant()
+        # Newest result per sensor: {"key": (lastArchived, moisture, hour), "minutes": float}
+        self.results: dict[int, dict] = {}
+        # Running job per sensor: (key, Future)
+        self.pending: dict[int, tuple[tuple, Future]] = {}
+        self.lock = threading.Lock()
+        self.poolLock = threading.Lock()
+
+    def getExecutor(self) -> ProcessPoolExecutor:
+        """Returns the process pool, started on first use ("spawn": no copy of the running threads)."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=initWorker,
+                                                initargs=(os.path.abspath(loader.path), connector.dbPath, getConfig("predictions", "nice")))
+        return self.executor
+
+    def restart(self, executor: ProcessPoolExecutor):
+        """Replaces a broken process pool (once, even if several jobs noticed it)."""
+        with self.poolLock:
+            if self.executor is executor:
+                logging.error("Prediction worker crashed, restarting pool.")
+                executor.shutdown(wait=False)
+                self.executor = None
+
+    def run(self, function, *args) -> Future:
+        """Queues a job in the process pool, retries once in a new pool if a worker crashed (e.g. killed by the OOM killer)."""
+        result = Future()
+
+        def start(retry: bool):
+            with self.poolLock:
+                executor = self.getExecutor()
+            try:
+                job = executor.submit(function, *args)
+            except BrokenProcessPool as ex:
+                job = Future()
+                job.set_exception(ex)
+            job.add_done_callback(lambda done: finish(executor, done, retry))
+
+        def finish(executor: ProcessPoolExecutor, job: Future, retry: bool):
+            # Pass the result of the job on, restart the pool on the first crash
+            if result.cancelled():
+                return
+            if job.cancelled():
+                result.cancel()
+            elif isinstance(job.exception(), BrokenProcessPool) and retry:
+                # Errors of the new pool (e.g. shut down, spawn failed) must still end the result
+                try:
+                    self.restart(executor)
+                    start(False)
+                except Exception as ex:
+                    result.set_exception(ex)
+            elif job.exception() is not None:
+                result.set_exception(job.exception())
+            else:
+                result.set_result(job.result())
+
+        start(True)
+        return result
+
+    def submit(self, sensor: int, moisture: float = None) -> Future:
+        """Queues a prediction of a sensor, returns the cached or running result if nothing changed."""
+        # Use most recent measurement if no moisture was chosen
+        lastArchived = self.dbAdapter.getLastArchived(sensor)
+        if moisture is None:
+            recentMeasurement = self.dbAdapter.getSingle(sensor=sensor, mode="recent")
+            moisture = None if recentMeasurement is None else recentMeasurement.moisture
+        if lastArchived is None or moisture is None:
+            future = Future()
+            future.set_result(None)
+            return future
+
+        # Results stay valid until new training data, another moisture or the next weather hour
+        key = (lastArchived, moisture, int(time.time()) // 3600)
+        with self.lock:
+            if sensor in self.results and self.results[sensor]["key"] == key:
+                future = Future()
+                future.set_result(self.results[sensor]["minutes"])
+                return future
+            if sensor in self.pending and self.pending[sensor][0] == key:
+                return self.pending[sensor][1]
+            if self.workers > 0:
+                future = self.run(predictInWorker, sensor, moisture)
+                self.pending[sensor] = (key, future)
+
+        # Run in the calling thread if no worker processes are configured
+        if self.workers == 0:
+            future = Future()
+            try:
+                future.set_result(predictInWorker(sensor, moisture))
+            except Exception as ex:
+                future.set_exception(ex)
+        future.add_done_callback(lambda done: self.store(sensor, key, done))
+        return future
+
+    def store(self, sensor: int, key: tuple, future: Future):
+        """Caches the result of a finished job."""
+        with self.lock:
+            if self.pending.get(sensor, (None, None))[1] is future:
+                del self.pending[sensor]
+            if not future.cancelled() and future.exception() is None:
+                self.results[sensor] = {"key": key, "minutes": future.result()}
+
+    def predict(self, sensor: int, moisture: float = None, timeout: float = None) -> float:
+        """Returns the predicted minutes until dry of a sensor (None if there is not enough data)."""
+        return self.submit(sensor, moisture).result(timeout)
+
+    def predictMany(self, sensors: list[int], timeout: float = None) -> dict[int, float]:
+        """Returns the predicted minutes until dry of many sensors, computed in parallel."""
+        futures = {sensor: self.submit(sensor) for sensor in sensors}
+        return {sensor: future.result(timeout) for sensor, future in futures.items()}
+
+    def submitPlants(self) -> tuple[list, dict, dict[int, Future]]:
+        """Runs the database queries of predictPlants and queues its model calls, returns plants, current moisture and jobs."""
+        # Plants with species and sensor (one joined query), current moisture of all sensors (one grouped query)
+        plants = self.dbAdapterPlant.getListWithSpecies()
+        current = self.dbAdapter.getCurrentMoisture()
+
+        # One model call per sensor: current moisture and the minimum moisture of each plant's species
+        targets: dict[int, list[float]] = {}
+        for entry, kind in plants:
+            if entry.sensorId in current:
+                targets.setdefault(entry.sensorId, []).append(kind.minMoisture)
+        if self.workers > 0:
+            with self.lock:
+                futures = {sensor: self.run(minutesUntilMoistureInWorker, sensor, current[sensor][0], values)
+                           for sensor, values in targets.items()}
+            return plants, current, futures
+
+        # Run in the calling thread if no worker processes are configured
+        futures = {}
+        for sensor, values in targets.items():
+            futures[sensor] = Future()
+            try:
+                futures[sensor].set_result(minutesUntilMoistureInWorker(sensor, current[sensor][0], values))
+            except Exception as ex:
+                futures[sensor].set_exception(ex)
+        return plants, current, futures
+
+    def collectPlants(self, plants: list, current: dict, futures: dict[int, Future], timeout: float = None) -> list[dict]:
+        """Waits for the jobs of submitPlants and returns the results of predictPlants (no database access)."""
+        predictions = {sensor: future.result(timeout) for sensor, future in futures.items()}
+
+        # Minutes until minMoisture (extrapolated: minMoisture is below the archived measurements of the sensor)
+        results = []; index: dict[int, int] = {}
+        for entry, kind in plants:
+            result = {"plantId": entry.plantId, "name": entry.name, "sensorId": entry.sensorId, "species": kind.name,
+                      "minMoisture": kind.minMoisture, "moisture": None, "minutes": None, "extrapolated": False}
+            if entry.sensorId in current:
+                result["moisture"] = current[entry.sensorId][0]
+                sensorPredictions = predictions[entry.sensorId]
+                if sensorPredictions is not None:
+                    result["minutes"], result["extrapolated"] = sensorPredictions[index.get(entry.sensorId, 0)]
+                index[entry.sensorId] = index.get(entry.sensorId, 0) + 1
+            results.append(result)
+        return results
+
+    def predictPlants(self, timeout: float = None) -> list[dict]:
+        """Returns the minutes until every plant reaches the minimum moisture of its species."""
+        return self.collectPlants(*self.submitPlants(), timeout)
+
+    def evaluate(self, sensor: int, timeout: float = None) -> dict:
+        """Returns the evaluation of a sensor's model (see core.predictions.hoursUntilDry)."""
+        if self.workers == 0:
+            return evaluateInWorker(sensor)
+        with self.lock:
+            future = self.run(evaluateInWorker, sensor)
+        return future.result(timeout)
+
+    def shutdown(self):
+        """Stops the worker processes (running jobs are cancelled)."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+# Shared service of the running system, created on first use
+service: PredictionService = None
+
+def getService() -> PredictionService:
+    """Returns the shared prediction service."""
+    global service
+    if service is None:
+        service = PredictionService()
+    return service
+
+def stopService():
+    """Stops the worker processes of the shared service (if started)."""
+    if service is not None:
+        service.shutdown()
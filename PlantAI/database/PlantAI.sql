@@ -31,6 +31,71 @@ CREATE TABLE IF NOT EXISTS measurements (
     moisture FLOAT,
     temperature FLOAT,
     minUntilDry INTEGER,
-    timestamp VARCHAR(15),
+    timestamp INTEGER, -- epoch seconds
     FOREIGN KEY (sensorId) REFERENCES sensors(sensorId)
 );
+
+CREATE TABLE IF NOT EXISTS weather (
+    location VARCHAR(40),
+    timestamp INTEGER, -- epoch seconds (hourly)
+    temperature FLOAT,
+    precipitation FLOAT,
+    PRIMARY KEY (location, timestamp)
+);
+
+CREATE TABLE IF NOT EXISTS measurementsHourly (
+    sensorId INTEGER,
+    bucket INTEGER, -- epoch seconds, start of the hour (UTC)
+    count INTEGER,
+    moistureMin FLOAT,
+    moistureMax FLOAT,
+    moistureSum FLOAT,
+    temperatureMin FLOAT,
+    temperatureMax FLOAT,
+    temperatureSum FLOAT,
+    PRIMARY KEY (sensorId, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS measurementsDaily (
+    sensorId INTEGER,
+    bucket INTEGER, -- epoch seconds, start of the day (UTC)
+    count INTEGER,
+    moistureMin FLOAT,
+    moistureMax FLOAT,
+    moistureSum FLOAT,
+    temperatureMin FLOAT,
+    temperatureMax FLOAT,
+    temperatureSum FLOAT,
+    PRIMARY KEY (sensorId, bucket)
+);
+
+-- Keep rollups up to date on every insert (deleting raw measurements keeps them)
+CREATE TRIGGER IF NOT EXISTS measurementsRollup AFTER INSERT ON measurements
+BEGIN
+    INSERT INTO measurementsHourly (sensorId, bucket, count, moistureMin, moistureMax, moistureSum, temperatureMin, temperatureMax, temperatureSum)
+    VALUES (NEW.sensorId, NEW.timestamp - NEW.timestamp % 3600, 1, NEW.moisture, NEW.moisture, NEW.moisture, NEW.temperature, NEW.temperature, NEW.temperature)
+    ON CONFLICT (sensorId, bucket) DO UPDATE SET
+        count = count + 1,
+        moistureMin = min(moistureMin, excluded.moistureMin),
+        moistureMax = max(moistureMax, excluded.moistureMax),
+        moistureSum = moistureSum + excluded.moistureSum,
+        temperatureMin = min(temperatureMin, excluded.temperatureMin),
+        temperatureMax = max(temperatureMax, excluded.temperatureMax),
+        temperatureSum = temperatureSum + excluded.temperatureSum;
+    INSERT INTO measurementsDaily (sensorId, bucket, count, moistureMin, moistureMax, moistureSum, temperatureMin, temperatureMax, temperatureSum)
+    VALUES (NEW.sensorId, NEW.timestamp - NEW.timestamp % 86400, 1, NEW.moisture, NEW.moisture, NEW.moisture, NEW.temperature, NEW.temperature, NEW.temperature)
+    ON CONFLICT (sensorId, bucket) DO UPDATE SET
+        count = count + 1,
+        moistureMin = min(moistureMin, excluded.moistureMin),
+        moistureMax = max(moistureMax, excluded.moistureMax),
+        moistureSum = moistureSum + excluded.moistureSum,
+        temperatureMin = min(temperatureMin, excluded.temperatureMin),
+        temperatureMax = max(temperatureMax, excluded.temperatureMax),
+        temperatureSum = temperatureSum + excluded.temperatureSum;
+END;
+
+CREATE INDEX IF NOT EXISTS measurementsBySensorDry ON measurements (sensorId, minUntilDry, timestamp);
+CREATE INDEX IF NOT EXISTS measurementsBySensorTime ON measurements (sensorId, timestamp);
+
+-- Schema version, see migrations in connector.py
+PRAGMA user_version = 2;
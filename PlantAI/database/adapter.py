@@ -5,9 +5,62 @@ Author: Tim Grundey
 Created: 25.09.2025
 """
 
+import time
 from abc import ABC, abstractmethod
-from database.connector import execute, fetchall, fetchone
-from core.models import plant, species, sensor, measurement
+from typing import TYPE_CHECKING, Iterable, Iterator
+from database.connector import execute, executeAll, executemany, fetchall, fetchchunks, fetchone
+from system.loader import getConfig
+from core.models import plant, species, sensor, measurement, measurementSeries, weather
+
+# NumPy is loaded with the first columnar fetch (not needed for acquisition)
+if TYPE_CHECKING:
+    import numpy as np
+
+# Columns of the measurements table and their NumPy types (for columnar fetches)
+measurementColumns = {
+    "measureId": "int64",
+    "sensorId": "int64",
+    "moisture": "float64",
+    "temperature": "float64",
+    "minUntilDry": "int64",
+    "timestamp": "int64",
+}
+
+# Rollup tables by resolution [s] (0 = raw measurements)
+rollupTables = {3600: "measurementsHourly", 86400: "measurementsDaily"}
+
+# Columns returned by range queries and their NumPy types
+rangeColumns = {
+    "timestamp": "int64",
+    "count": "int64",
+    "moisture": "float64",
+    "moistureMin": "float64",
+    "moistureMax": "float64",
+    "temperature": "float64",
+    "temperatureMin": "float64",
+    "temperatureMax": "float64",
+}
+
+def toColumns(chunks: Iterable[list[tuple]], columns: dict) -> dict[str, "np.ndarray"]:
+    """Returns chunks of rows as one NumPy array per column (columns: name and type)."""
+    import numpy as np
+    # Convert every chunk to arrays, then join them
+    arrays = {column: [] for column in columns}
+    for chunk in chunks:
+        for column, data in zip(columns, zip(*chunk)):
+            arrays[column].append(np.array(data, dtype=columns[column]))
+    return {column: np.concatenate(data) if data else np.empty(0, dtype=columns[column])
+            for column, data in arrays.items()}
+
+def getWhereClause(mode: str) -> str:
+    """Returns the additional WHERE clause of measurements for the chosen mode."""
+    if mode == "archived":
+        return "AND minUntilDry != '-1'"
+    elif mode == "current":
+        return "AND minUntilDry = '-1'"
+    elif mode == "all":
+        return ""
+    raise ValueError(f"Unknown mode: {mode}")
 
 class DBAdapter(ABC):
     @abstractmethod
@@ -36,6 +89,23 @@ class DBAdapterPlant(DBAdapter):
             allPlants.append(plant(plantId=entry[0], speciesId=entry[1], sensorId=entry[2], name=entry[3]))
         return allPlants
 
+    def getListWithSpecies(self) -> list[tuple[plant, species]]:
+        """Returns a list of all plants with a sensor and their species (one joined query)."""
+        query = """
+            SELECT plants.plantId, plants.speciesId, plants.sensorId, plants.name, species.name, species.minMoisture
+            FROM plants
+            JOIN species ON species.speciesId = plants.speciesId
+            JOIN sensors ON sensors.sensorId = plants.sensorId
+            ORDER BY plants.plantId
+            """
+        allPlants = []
+
+        # Create a list of plants and species
+        for entry in fetchall(query):
+            allPlants.append((plant(plantId=entry[0], speciesId=entry[1], sensorId=entry[2], name=entry[3]),
+                              species(speciesId=entry[1], name=entry[4], minMoisture=entry[5])))
+        return allPlants
+
     def insert(self, data: plant):
         query = "INSERT INTO plants (speciesId, sensorId, name) VALUES (?, ?, ?)"
         values = (data.speciesId, data.sensorId, data.name)
@@ -132,6 +202,29 @@ class DBAdapterMeasurement(DBAdapter):
             return measurement(measureId=result[0],sensorId=result[1], moisture=result[2], 
                                temperature=result[3], minUntilDry=result[4], timestamp=result[5])
 
+    def getLatest(self, sensor: int) -> measurement:
+        """Returns the newest measurement of a sensor (archived or not)."""
+        query = "SELECT * FROM measurements WHERE sensorId = ? ORDER BY timestamp DESC LIMIT 1"
+        values = (sensor,)
+
+        # Convert result to measurement
+        result = fetchone(query, values)
+        if result is None:
+            return None
+        else:
+            return measurement(measureId=result[0],sensorId=result[1], moisture=result[2], 
+                               temperature=result[3], minUntilDry=result[4], timestamp=result[5])
+
+    def getCurrentMoisture(self) -> dict[int, tuple[float, int]]:
+        """Returns the moisture and timestamp of the newest non-archived measurement of every sensor (one grouped query)."""
+        # SQLite takes the other columns from the row with MAX(timestamp)
+        query = """
+            SELECT sensorId, moisture, MAX(timestamp) FROM measurements
+            WHERE minUntilDry = '-1'
+            GROUP BY sensorId
+            """
+        return {entry[0]: (entry[1], entry[2]) for entry in fetchall(query)}
+
     def getList(self, sensor: int, limit: int, mode: str = "all") -> list[measurement]:
         """
         Returns a list with measurements sorted from old to new.
@@ -142,18 +235,10 @@ class DBAdapterMeasurement(DBAdapter):
             - "all": All saved measurements.
         """
 
-        # Select WHERE clause
-        if mode == "archived":
-            whereClause = "AND minUntilDry != '-1'"
-        elif mode == "current":
-            whereClause = "AND minUntilDry = '-1'"
-        elif mode == "all":
-            whereClause = ""
-
         # Create query
         query = f"""
             SELECT * FROM (
-                SELECT * FROM measurements WHERE sensorId = ? {whereClause}
+                SELECT * FROM measurements WHERE sensorId = ? {getWhereClause(mode)}
                 ORDER BY timestamp DESC 
                 LIMIT ?) 
             ORDER BY timestamp
@@ -168,20 +253,221 @@ class DBAdapterMeasurement(DBAdapter):
                             temperature=result[3], minUntilDry=result[4], timestamp=result[5]))
         return allMeasurements
 
+    def getChunks(self, sensor: int, limit: int = -1, mode: str = "all", columns: tuple = tuple(measurementColumns),
+                  chunkSize: int = None) -> Iterator[list[tuple]]:
+        """
+        Yields measurements sorted from old to new in lists of chunkSize rows with the chosen columns.
+
+        sensor: None = all sensors (grouped by sensor)
+        mode: see getList.
+        """
+        if chunkSize is None:
+            chunkSize = getConfig("database", "chunkSize")
+        for column in columns:
+            if column not in measurementColumns:
+                raise ValueError(f"Unknown column: {column}")
+
+        # Create query (unlimited queries are read in index order without sorting, all sensors grouped by sensor)
+        selection = ", ".join(columns)
+        condition, order, values = ("sensorId = ?", "timestamp", (sensor,)) if sensor is not None else ("sensorId IS NOT NULL", "sensorId, timestamp", ())
+        if limit < 0:
+            query = f"""
+                SELECT {selection} FROM measurements WHERE {condition} {getWhereClause(mode)}
+                ORDER BY {order}
+                """
+        else:
+            query = f"""
+                SELECT {selection} FROM (
+                    SELECT * FROM measurements WHERE {condition} {getWhereClause(mode)}
+                    ORDER BY timestamp DESC
+                    LIMIT ?)
+                ORDER BY {order}
+                """
+            values = values + (limit,)
+
+        # Return result chunk by chunk
+        yield from fetchchunks(query, values, chunkSize)
+
+    def getColumns(self, sensor: int, limit: int = -1, mode: str = "all", columns: tuple = tuple(measurementColumns),
+                   chunkSize: int = None) -> dict[str, "np.ndarray"]:
+        """
+        Returns measurements sorted from old to new as one NumPy array per column.
+
+        The cursor is read in chunks, so no measurement objects or row lists are created.
+        mode: see getList.
+        """
+        chunks = self.getChunks(sensor, limit, mode, columns, chunkSize)
+        return toColumns(chunks, {column: measurementColumns[column] for column in columns})
+
+    def getSeries(self, sensor: int = None, limit: int = -1, mode: str = "all", chunkSize: int = None) -> measurementSeries:
+        """Returns measurements sorted from old to new as compact series, use series.sensor() per sensor (see getChunks)."""
+        series = measurementSeries()
+        for chunk in self.getChunks(sensor, limit, mode, tuple(measurementSeries.columns), chunkSize):
+            for name, data in zip(measurementSeries.columns, zip(*chunk)):
+                getattr(series, name).extend(data)
+        return series
+
+    def getFrame(self, sensor: int, limit: int = -1, mode: str = "all", columns: tuple = tuple(measurementColumns),
+                 chunkSize: int = None):
+        """Returns measurements sorted from old to new as pandas DataFrame (see getColumns)."""
+        # pandas is only needed for predictions
+        import pandas as pd
+        return pd.DataFrame(self.getColumns(sensor, limit, mode, columns, chunkSize), columns=list(columns))
+
+    def getResolution(self, start: int, end: int, step: float = None, points: int = None) -> int:
+        """Returns the coarsest resolution [s] (0 = raw, 3600 = hourly, 86400 = daily) that still satisfies step or points."""
+        if step is None:
+            step = (end - start) / points if points else 0
+        resolution = 0
+        for size in sorted(rollupTables):
+            if size <= step:
+                resolution = size
+
+        # Raw measurements older than the retention period only exist as rollups
+        retentionDays = getConfig("database", "retentionDays")
+        if resolution == 0 and retentionDays > 0 and start < time.time() - retentionDays * 86400:
+            resolution = min(rollupTables)
+        return resolution
+
+    def getRange(self, sensor: int, start: int, end: int, step: float = None, points: int = None,
+                 chunkSize: int = None) -> dict[str, "np.ndarray"]:
+        """
+        Returns measurements between start and end (epoch seconds) sorted from old to new as one NumPy array per column.
+
+        Uses the coarsest table that satisfies the requested step [s] or amount of points (see getResolution).
+        Columns: timestamp, count, moisture, moistureMin, moistureMax, temperature, temperatureMin, temperatureMax
+        (moisture and temperature are averages for rollups).
+        """
+        if chunkSize is None:
+            chunkSize = getConfig("database", "chunkSize")
+        resolution = self.getResolution(start, end, step, points)
+
+        # Create query
+        if resolution == 0:
+            query = """
+                SELECT timestamp, 1, moisture, moisture, moisture, temperature, temperature, temperature
+                FROM measurements WHERE sensorId = ? AND timestamp BETWEEN ? AND ?
+                ORDER BY timestamp
+                """
+            values = (sensor, start, end)
+        else:
+            query = f"""
+                SELECT bucket, count, moistureSum / count, moistureMin, moistureMax,
+                       temperatureSum / count, temperatureMin, temperatureMax
+                FROM {rollupTables[resolution]} WHERE sensorId = ? AND bucket > ? AND bucket <= ?
+                ORDER BY bucket
+                """
+            values = (sensor, start - resolution, end)
+        return toColumns(fetchchunks(query, values, chunkSize), rangeColumns)
+
+    def getLastArchived(self, sensor: int) -> int:
+        """Returns the timestamp of the newest archived measurement (None if nothing is archived)."""
+        query = "SELECT MAX(timestamp) FROM measurements WHERE sensorId = ? AND minUntilDry != '-1'"
+        values = (sensor,)
+        return fetchone(query, values)[0]
+
     def insert(self, data: measurement):
         """Inserts a new measurement."""
         query = "INSERT INTO measurements (sensorId, moisture, temperature, minUntilDry, timestamp) VALUES (?, ?, ?, ?, ?)"
         values = (data.sensorId, data.moisture, data.temperature, data.minUntilDry, data.timestamp)
         execute(query, values)
 
+    def insertMany(self, data: Iterable[measurement], chunkSize: int = None) -> int:
+        """Inserts many measurements in a single transaction and returns the amount."""
+        if chunkSize is None:
+            chunkSize = getConfig("database", "chunkSize")
+        query = "INSERT INTO measurements (sensorId, moisture, temperature, minUntilDry, timestamp) VALUES (?, ?, ?, ?, ?)"
+        values = ((entry.sensorId, entry.moisture, entry.temperature, entry.minUntilDry, entry.timestamp) for entry in data)
+        return executemany(query, values, chunkSize)
+
     def update(self, id: int, min: int):
         """Updates minUntilDry for the chosen measureId."""
         query = "UPDATE measurements SET minUntilDry = ? WHERE measureId = ?"
         values = (min, id)
         execute(query, values)
 
+    def updateMinutesUntilDry(self, sensor: int, timestamp: int):
+        """Sets minUntilDry of all non-archived measurements up to the chosen timestamp relative to it."""
+        query = """
+            UPDATE measurements SET minUntilDry = CAST(ROUND((? - timestamp) / 60.0) AS INTEGER)
+            WHERE sensorId = ? AND minUntilDry = '-1' AND timestamp <= ?
+            """
+        values = (timestamp, sensor, timestamp)
+        execute(query, values)
+
+    def prune(self, days: int) -> int:
+        """Deletes archived measurements older than x days and returns the amount (rollups keep their aggregates)."""
+        query = "DELETE FROM measurements WHERE minUntilDry != '-1' AND timestamp < ?"
+        values = (int(time.time()) - days * 86400,)
+        return executemany(query, [values])
+
     def delete(self, data: int):
-        """Deletes all measurements for the chosen sensorId."""
-        query = "DELETE FROM measurements WHERE sensorId = ?"
+        """Deletes all measurements and rollups for the chosen sensorId."""
+        # Rollups and measurements in one transaction
+        commands = [(f"DELETE FROM {table} WHERE sensorId = ?", (data,)) for table in rollupTables.values()]
+        commands.append(("DELETE FROM measurements WHERE sensorId = ?", (data,)))
+
+        # Raise exception if nothing was deleted
+        if executeAll(commands) == 0:
+            raise Exception("No matching entry found.")
+
+class DBAdapterWeather(DBAdapter):
+    def getList(self, location: str, limit: int) -> list[weather]:
+        """Returns a list with the newest hourly weather entries of a location sorted from old to new."""
+        query = """
+            SELECT * FROM (
+                SELECT * FROM weather WHERE location = ?
+                ORDER BY timestamp DESC
+                LIMIT ?)
+            ORDER BY timestamp
+            """
+        values = (location, limit)
+        allWeather = []
+
+        # Create a list of weather entries
+        for entry in fetchall(query, values):
+            allWeather.append(weather(location=entry[0], timestamp=entry[1], temperature=entry[2], precipitation=entry[3]))
+        return allWeather
+
+    def getSingle(self, location: str, timestamp: int) -> weather:
+        """Returns the weather entry of a location at (or last before) the chosen timestamp."""
+        query = "SELECT * FROM weather WHERE location = ? AND timestamp <= ? ORDER BY timestamp DESC"
+        values = (location, timestamp)
+
+        # Convert result to weather
+        result = fetchone(query, values)
+        if result is None:
+            return None
+        else:
+            return weather(location=result[0], timestamp=result[1], temperature=result[2], precipitation=result[3])
+
+    def getFrame(self, location: str):
+        """Returns all weather entries of a location sorted from old to new as pandas DataFrame."""
+        # pandas is only needed for predictions
+        import pandas as pd
+        query = "SELECT timestamp, temperature, precipitation FROM weather WHERE location = ? ORDER BY timestamp"
+        values = (location,)
+        return pd.DataFrame(fetchall(query, values), columns=["timestamp", "airTemperature", "precipitation"])
+
+    def insert(self, data: weather):
+        """Inserts or replaces the weather entry of a location and hour."""
+        query = "INSERT OR REPLACE INTO weather (location, timestamp, temperature, precipitation) VALUES (?, ?, ?, ?)"
+        values = (data.location, data.timestamp, data.temperature, data.precipitation)
+        execute(query, values)
+
+    def insertMany(self, data: Iterable[weather]) -> int:
+        """Inserts or replaces many weather entries in a single transaction and returns the amount."""
+        query = "INSERT OR REPLACE INTO weather (location, timestamp, temperature, precipitation) VALUES (?, ?, ?, ?)"
+        values = ((entry.location, entry.timestamp, entry.temperature, entry.precipitation) for entry in data)
+        return executemany(query, values, getConfig("database", "chunkSize"))
+
+    def update(self, data: weather):
+        query = "UPDATE weather SET temperature = ?, precipitation = ? WHERE location = ? AND timestamp = ?"
+        values = (data.temperature, data.precipitation, data.location, data.timestamp)
+        execute(query, values)
+
+    def delete(self, data: str):
+        """Deletes all weather entries for the chosen location."""
+        query = "DELETE FROM weather WHERE location = ?"
         values = (data,)
         execute(query, values)
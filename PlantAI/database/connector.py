@@ -7,23 +7,135 @@ Created: 25.09.2025
 
 import logging
 import sqlite3
+import threading
+from itertools import islice
+from typing import Iterable, Iterator
 from system.loader import getConfig
 
+# One connection per thread, reused for every query of that thread
+local = threading.local()
+connections: list[sqlite3.Connection] = []
+lock = threading.Lock()
+generation = 0 # Increased on close, invalidates connections of all threads
+dbPath = None  # Overrides the path from the config file
+
 def connect():
-    """Connect to the SQLite Database."""
-    path = getConfig("database","path")
-    con = sqlite3.connect(path)
+    """Returns the connection of the current thread and a new cursor."""
+    con = getattr(local, "con", None)
+    if con is None or local.generation != generation:
+        # Open connection once per thread (closed from main thread on shutdown)
+        path = dbPath or getConfig("database","path")
+        con = sqlite3.connect(path, check_same_thread=False)
+        configure(con)
+        with lock:
+            connections.append(con)
+            local.con, local.generation = con, generation
     return con, con.cursor()
 
-def createDB(path: str):
-    """Creates a new SQLite Database."""
+def configure(con: sqlite3.Connection):
+    """Applies the storage profile from the config file to a connection."""
+    storage = getConfig("database", "storage")
+    con.execute(f"PRAGMA journal_mode = {storage['journalMode']}")
+    con.execute(f"PRAGMA synchronous = {storage['synchronous']}")
+    con.execute(f"PRAGMA cache_size = {int(storage['cacheSize'])}")
+    con.execute(f"PRAGMA mmap_size = {int(storage['mmapSize'])}")
+    con.execute(f"PRAGMA busy_timeout = {int(storage['busyTimeout'])}")
+
+def close():
+    """Closes all open database connections."""
+    global generation
+    with lock:
+        for con in connections:
+            con.close()
+        connections.clear()
+        generation += 1
+
+    # Logs
+    logging.info("Database connections closed.")
+
+def useDatabase(path: str):
+    """Switches all threads to another database file (e.g. for benchmarks)."""
+    global dbPath
+    close()
+    dbPath = path
+
+# Migrations for existing databases (schema version: SQL script)
+migrations = {
+    # Store timestamps as epoch seconds instead of "%Y/%m/%d %H:%M"
+    1: """
+        BEGIN;
+        ALTER TABLE measurements RENAME TO measurementsOld;
+        CREATE TABLE measurements (
+            measureId INTEGER PRIMARY KEY,
+            sensorId INTEGER,
+            moisture FLOAT,
+            temperature FLOAT,
+            minUntilDry INTEGER,
+            timestamp INTEGER,
+            FOREIGN KEY (sensorId) REFERENCES sensors(sensorId)
+        );
+        INSERT INTO measurements (measureId, sensorId, moisture, temperature, minUntilDry, timestamp)
+            SELECT measureId, sensorId, moisture, temperature, minUntilDry,
+                   CAST(strftime('%s', replace(timestamp, '/', '-'), 'utc') AS INTEGER)
+            FROM measurementsOld;
+        DROP TABLE measurementsOld;
+        PRAGMA user_version = 1;
+        COMMIT;
+        """,
+    # Hourly and daily rollups of existing measurements
+    2: """
+        BEGIN;
+        CREATE TABLE IF NOT EXISTS measurementsHourly (
+            sensorId INTEGER,
+            bucket INTEGER, -- epoch seconds, start of the hour (UTC)
+            count INTEGER,
+            moistureMin FLOAT,
+            moistureMax FLOAT,
+            moistureSum FLOAT,
+            temperatureMin FLOAT,
+            temperatureMax FLOAT,
+            temperatureSum FLOAT,
+            PRIMARY KEY (sensorId, bucket)
+        );
+        CREATE TABLE IF NOT EXISTS measurementsDaily (
+            sensorId INTEGER,
+            bucket INTEGER, -- epoch seconds, start of the day (UTC)
+            count INTEGER,
+            moistureMin FLOAT,
+            moistureMax FLOAT,
+            moistureSum FLOAT,
+            temperatureMin FLOAT,
+            temperatureMax FLOAT,
+            temperatureSum FLOAT,
+            PRIMARY KEY (sensorId, bucket)
+        );
+        INSERT INTO measurementsHourly
+            SELECT sensorId, timestamp - timestamp % 3600, COUNT(*), MIN(moisture), MAX(moisture), SUM(moisture),
+                   MIN(temperature), MAX(temperature), SUM(temperature)
+            FROM measurements GROUP BY sensorId, timestamp - timestamp % 3600;
+        INSERT INTO measurementsDaily
+            SELECT sensorId, timestamp - timestamp % 86400, COUNT(*), MIN(moisture), MAX(moisture), SUM(moisture),
+                   MIN(temperature), MAX(temperature), SUM(temperature)
+            FROM measurements GROUP BY sensorId, timestamp - timestamp % 86400;
+        PRAGMA user_version = 2;
+        COMMIT;
+        """,
+}
+
+def executeScript(path: str):
+    """Executes every command of an SQL file."""
     # Read SQL file
     file = open(path, "r")
     sqlFile = file.read()
     file.close()
 
-    # Split SQL commands
-    sqlCommands = sqlFile.split(";")
+    # Split SQL commands (semicolons inside triggers don't end a command)
+    sqlCommands = []; command = ""
+    for part in sqlFile.split(";"):
+        command += part + ";"
+        if sqlite3.complete_statement(command):
+            sqlCommands.append(command)
+            command = ""
 
     # Execute each command
     con, cur = connect()
@@ -32,11 +144,35 @@ def createDB(path: str):
             cur.execute(command)
         except sqlite3.OperationalError as msg:
             print("Command skipped: ", msg)
+    con.commit()
     cur.close()
 
+def createDB(path: str):
+    """Creates a new SQLite Database."""
+    executeScript(path)
+
     # Logs
     logging.info("New database created.")
 
+def migrateDB(path: str):
+    """Migrates an existing SQLite Database to the current schema."""
+    con, cur = connect()
+    version = cur.execute("PRAGMA user_version").fetchone()[0]
+
+    # Run all migrations newer than the database
+    for target in sorted(migrations):
+        if target > version:
+            try:
+                cur.executescript(migrations[target])
+            except sqlite3.Error:
+                con.rollback()
+                raise
+            logging.info(f"Database migrated to version {target}.")
+    cur.close()
+
+    # Create missing tables and indexes
+    executeScript(path)
+
 def execute(query: str, values: tuple = ()):
     """Executes an SQL query without returning a value."""
     con, cur = connect()
@@ -49,6 +185,41 @@ def execute(query: str, values: tuple = ()):
         raise Exception("No matching entry found.")
     cur.close()
 
+def executemany(query: str, values: Iterable[tuple], chunkSize: int = 1000) -> int:
+    """Executes an SQL query for all values in a single transaction and returns the row count."""
+    con, cur = connect()
+    values = iter(values)
+    rowcount = 0
+    try:
+        # Insert in chunks to keep memory bounded, commit once (all or nothing)
+        while chunk := list(islice(values, chunkSize)):
+            cur.executemany(query, chunk)
+            rowcount += cur.rowcount
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        cur.close()
+    return rowcount
+
+def executeAll(commands: Iterable[tuple[str, tuple]]) -> int:
+    """Executes several SQL queries in a single transaction and returns the total row count."""
+    con, cur = connect()
+    rowcount = 0
+    try:
+        # Commit once (all or nothing)
+        for query, values in commands:
+            cur.execute(query, values)
+            rowcount += cur.rowcount
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        cur.close()
+    return rowcount
+
 def fetchone(query: str, values: tuple = ()):
     """Executes an SQL query and returns one entry."""
     con, cur = connect()
@@ -68,3 +239,15 @@ def fetchall(query: str, values: tuple = ()):
     result = cur.fetchall()
     cur.close()
     return result
+
+def fetchchunks(query: str, values: tuple = (), chunkSize: int = 1000) -> Iterator[list]:
+    """Executes an SQL query and yields the result in lists of chunkSize entries."""
+    con, cur = connect()
+    cur.execute(query, values)
+
+    # Return result chunk by chunk
+    try:
+        while chunk := cur.fetchmany(chunkSize):
+            yield chunk
+    finally:
+        cur.close()
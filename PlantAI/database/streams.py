@@ -6,32 +6,55 @@ Created: 21.10.2025
 """
 
 import csv
+import gzip
 import logging
-from core.models import measurement
+from datetime import datetime
+from typing import Callable, Iterable, Iterator
+from core.models import measurement, timeFormat
 
-def exportAsCSV(path: str, allMeasurements: list[measurement]):
-    """Exports a list of measurements as CSV."""
-    with open(path, "w", newline="") as file:
+def openCSV(path: str, mode: str, compress: bool = None):
+    """Opens a CSV file for reading ("r") or writing ("w"), gzip compressed if chosen or path ends with .gz."""
+    if compress is None:
+        compress = path.endswith(".gz")
+    if compress:
+        return gzip.open(path, mode + "t", newline="")
+    return open(path, mode, newline="")
+
+def exportAsCSV(path: str, chunks: Iterable[list[tuple]], compress: bool = None,
+                progress: Callable[[int], None] = None) -> int:
+    """Exports chunks of measurement rows (minUntilDry, moisture, temperature, timestamp) as CSV and returns the amount."""
+    count = 0
+    with openCSV(path, "w", compress) as file:
         writer = csv.writer(file)
 
-        # Write header then all data rows
+        # Write header then all data rows, one chunk at a time
         writer.writerow(["Minutes until Dry", "Moisture", "Temperature", "Timestamp"])
-        for object in allMeasurements:
-            writer.writerow([object.minUntilDry, object.moisture, object.temperature, object.timestamp])
+        for chunk in chunks:
+            writer.writerows((minUntilDry, moisture, temperature, datetime.fromtimestamp(timestamp).strftime(timeFormat))
+                             for minUntilDry, moisture, temperature, timestamp in chunk)
+            count += len(chunk)
+            if progress is not None:
+                progress(count)
+
     # Logs
-    logging.info("CSV export created.")
+    logging.info(f"CSV export created ({count} entries).")
+    return count
 
-def importFromCSV(path: str, sensorId: int) -> list[measurement]:
-    """Returns a list of measurements from CSV."""
-    with open(path, newline="") as file:
+def importFromCSV(path: str, sensorId: int, compress: bool = None, progress: Callable[[int], None] = None,
+                  progressInterval: int = 10000) -> Iterator[measurement]:
+    """Yields measurements from CSV one row at a time."""
+    count = 0
+    with openCSV(path, "r", compress) as file:
         reader = csv.reader(file)
         next(reader) # skip header row
 
         # Create measurement object for every row
-        allMeasurements = []
         for row in reader:
-            allMeasurements.append(
-                measurement(sensorId = sensorId, minUntilDry = row[0], moisture = row[1], temperature = row[2], timestamp = row[3]))
-        return allMeasurements
+            timestamp = int(datetime.strptime(row[3], timeFormat).timestamp())
+            yield measurement(sensorId = sensorId, minUntilDry = row[0], moisture = row[1], temperature = row[2], timestamp = timestamp)
+            count += 1
+            if progress is not None and count % progressInterval == 0:
+                progress(count)
+
     # Logs
-    logging.info("Imported measurements from CSV.")
\ No newline at end of file
+    logging.info(f"Imported {count} measurements from CSV.")
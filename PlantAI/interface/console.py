@@ -7,14 +7,21 @@ Created: 30.09.2025
 
 import logging
 import sys
-from api.OpenMeteo import getWeather
-from database.adapter import DBAdapter, DBAdapterPlant, DBAdapterSpecies, DBAdapterSensor, DBAdapterMeasurement
+import time
+from datetime import datetime
+from database.connector import close
+from database.adapter import DBAdapter, DBAdapterPlant, DBAdapterSpecies, DBAdapterSensor, DBAdapterMeasurement, DBAdapterWeather
 from database.streams import exportAsCSV, importFromCSV
-from core.models import plant, species, sensor
-from core.predictions import hoursUntilDry
+from core.models import plant, species, sensor, timeFormat
+from core.events import bus
+from core.features import stopWeather, weatherScheduler
+from core.measurements import getSamplingStats, scheduler, stopMeasurement
+from core.service import getService, stopService
+from interface.server import stopServer
 from system.loader import getConfig
 
-def mainMenu(dbAdapterPlant: DBAdapterPlant, dbAdapterSpecies: DBAdapterSpecies, dbAdapterSensor: DBAdapterSensor, dbAdapterMeasurement: DBAdapterMeasurement):
+def mainMenu(dbAdapterPlant: DBAdapterPlant, dbAdapterSpecies: DBAdapterSpecies, dbAdapterSensor: DBAdapterSensor, dbAdapterMeasurement: DBAdapterMeasurement,
+             dbAdapterWeather: DBAdapterWeather):
     """Main Menu of the console interface."""
     print("Welcome to PlantAI!")
     while True:
@@ -60,10 +67,18 @@ def mainMenu(dbAdapterPlant: DBAdapterPlant, dbAdapterSpecies: DBAdapterSpecies,
                 exportEntry(dbAdapterMeasurement)
             else:
                 unknown()
+        elif userInput == "history":
+            history(dbAdapterMeasurement)
         elif userInput == "predict":
             predict(dbAdapterMeasurement)
+        elif userInput == "predict all":
+            predictAll()
+        elif userInput == "evaluate":
+            evaluate(dbAdapterMeasurement)
         elif userInput == "weather":
-            weather()
+            weather(dbAdapterWeather)
+        elif userInput == "status":
+            status()
         elif userInput == "help":
             help()
         elif userInput == "exit" or userInput == "bye":
@@ -98,7 +113,7 @@ def addEntry(dbAdapter: DBAdapter):
         print("Species added!")
 
     elif isinstance(dbAdapter, DBAdapterSensor):
-        print("Choose I2C-Address (hex: 0x36):")
+        print("Choose I2C-Address of the ADS1115 (hex: 0x48-0x4B):")
         userInputI2C = input(">>> ")
 
         # Fill data with user input
@@ -168,17 +183,39 @@ def showEntry(dbAdapter: DBAdapter):
     for object in result:
         print(object.__str__())
 
+# Show history
+def history(dbAdapter: DBAdapterMeasurement):
+    """Prints measurements of the last x days, aggregated to about 50 rows."""
+    print("Choose a sensor to show (ID):")
+    userInputId = input(">>> ")
+    print("Choose how many days:")
+    userInputDays = input(">>> ")
+
+    # Choose raw, hourly or daily data depending on the time range
+    end = int(time.time())
+    start = end - int(float(userInputDays) * 86400)
+    result = dbAdapter.getRange(sensor=int(userInputId), start=start, end=end, points=50)
+
+    print("[Timestamp | Count | Moisture (min-max) | Temperature (min-max)]")
+    print("-----------------------------------------------------------------")
+    for x in range(len(result["timestamp"])):
+        timestamp = datetime.fromtimestamp(int(result["timestamp"][x])).strftime(timeFormat)
+        print(f"[{timestamp} | {result['count'][x]} | {result['moisture'][x]:.2f} ({result['moistureMin'][x]:.2f}-{result['moistureMax'][x]:.2f}) | "
+              f"{result['temperature'][x]:.2f} ({result['temperatureMin'][x]:.2f}-{result['temperatureMax'][x]:.2f})]")
+
 # Import entry
 def importEntry(dbAdapter: DBAdapterMeasurement):
     """Imports measurements of the selected sensor as CSV."""
     print("Choose a sensor to import (ID):")
     userInputId = input(">>> ")
 
-    # Insert new data into database
+    # Insert new data into database (all or nothing)
     path = getConfig("csv", "import")
-    for entry in importFromCSV(path=path, sensorId=userInputId):
-        dbAdapter.insert(entry)
-    print("Import successful!")
+    try:
+        count = dbAdapter.insertMany(importFromCSV(path=path, sensorId=userInputId, progress=showProgress))
+        print(f"\nImport successful! ({count} entries)")
+    except Exception as ex:
+        print(f"\nImport failed, nothing imported: {ex}")
 
 # Export entry
 def exportEntry(dbAdapter: DBAdapterMeasurement):
@@ -186,31 +223,119 @@ def exportEntry(dbAdapter: DBAdapterMeasurement):
     print("Choose a sensor to export (ID):")
     userInputId = input(">>> ")
     
-    # Get all objects from database (-1 = unlimited)
-    result = dbAdapter.getList(sensor=int(userInputId), limit=int(-1), mode="all")
+    # Stream all measurements from database in chunks
+    chunks = dbAdapter.getChunks(sensor=int(userInputId), mode="all", columns=("minUntilDry", "moisture", "temperature", "timestamp"))
 
-    # Create export
+    # Create export (gzip compressed if the path ends with .gz)
     path = getConfig("csv", "export")
-    exportAsCSV(path=path, allMeasurements=result)
-    print("Export successful!")
+    count = exportAsCSV(path=path, chunks=chunks, progress=showProgress)
+    print(f"\nExport successful! ({count} entries)")
+
+# Show progress
+def showProgress(count: int):
+    """Prints the amount of processed entries in the same line."""
+    print(f"\r{count} entries processed...", end="", flush=True)
 
 # Predictions
 def predict(dbAdapter: DBAdapterMeasurement):
     """Predicts in how many hours the plant has to be watered again."""
-    hoursUntilDry(dbAdapter.getList(sensor=1, limit=int(-1), mode="archived"))
+    print("Choose a sensor to predict (ID):")
+    userInputId = input(">>> ")
+
+    # Use stored model, retrains only after new drying cycles (in the prediction worker processes)
+    try:
+        minutes = getService().predict(sensor=int(userInputId))
+    except Exception as ex:
+        logging.error(f"Prediction of sensor {userInputId} failed: {ex}")
+        print(f"Prediction failed: {ex}")
+        return
+    if minutes is None:
+        print("No archived or recent measurements found.")
+    else:
+        print(f"Sensor {userInputId} is dry in {minutes / 60.0:.1f} hours ({minutes:.0f} minutes).")
+
+# Predictions of all plants
+def predictAll():
+    """Predicts for every plant how long until it reaches the minimum moisture of its species."""
+    try:
+        results = getService().predictPlants()
+    except Exception as ex:
+        logging.error(f"Predictions of all plants failed: {ex}")
+        print(f"Predictions failed: {ex}")
+        return
+    print("[Plant | Name | Species | Sensor | Moisture | Min. moisture | Hours left]")
+    print("-----------------------------------------------------------------------")
+    for entry in results:
+        moisture = "-" if entry["moisture"] is None else f"{entry['moisture']:.1f}"
+        hours = "-" if entry["minutes"] is None else f"{entry['minutes'] / 60.0:.1f}"
+        # Extrapolated: the minimum moisture is below all archived measurements of the sensor
+        hours += "*" if entry["extrapolated"] else ""
+        print(f"[{entry['plantId']} | {entry['name']} | {entry['species']} | {entry['sensorId']} | {moisture} | {entry['minMoisture']} | {hours}]")
+    if any(entry["extrapolated"] for entry in results):
+        print("* extrapolated below the driest archived measurement")
+
+# Evaluate predictions
+def evaluate(dbAdapter: DBAdapterMeasurement):
+    """Trains a new model with test data and prints its metrics (plot is saved as file)."""
+    print("Choose a sensor to evaluate (ID):")
+    userInputId = input(">>> ")
+
+    try:
+        # Training and plot rendering run in the prediction worker processes (cached for unchanged data)
+        evaluation = getService().evaluate(sensor=int(userInputId))
+    except ValueError as ex:
+        print(f"Not enough archived measurements: {ex}")
+        return
+    except Exception as ex:
+        logging.error(f"Evaluation of sensor {userInputId} failed: {ex}")
+        print(f"Evaluation failed: {ex}")
+        return
+    print(f"Predictions: {len(evaluation['predictions'])} newest measurements ({evaluation['model']})")
+    print(f"MAE: {evaluation['mae']:.3f}, R²: {evaluation['r2']:.3f}")
+    if "plot" in evaluation:
+        print(f"Plot: {evaluation['plot']}")
+
+    # Optional window (blocks until it is closed)
+    if getConfig("predictions", "showPlot"):
+        from core.predictions import showEvaluation
+        showEvaluation(evaluation)
 
 # Show weather
-def weather():
+def weather(dbAdapter: DBAdapterWeather):
     """Prints a weather forecast of the selected location."""
     print("Choose a location:")
     userInput = input(">>> ")
+    from api.OpenMeteo import formatForecast
+    from core.features import updateWeather
 
     try:
-        # Get weather for location
-        print(getWeather(userInput))
+        # Get weather for location and store hourly values for predictions
+        print(formatForecast(updateWeather(dbAdapter, userInput)))
     except Exception as ex:
         print(ex)
 
+# Show status
+def status():
+    """Prints timing metrics of the measurement and weather schedulers."""
+    print("[Task | Interval | Runs | Missed | Lateness last/mean/max | Jitter | Duration]")
+    print("--------------------------------------------------------------------------")
+    for name, metrics in {**scheduler.getMetrics(), **weatherScheduler.getMetrics()}.items():
+        print(f"[{name} | {metrics['interval']}s | {metrics['runs']} | {metrics['missed']} | "
+              f"{metrics['latenessLast'] * 1000:.1f}/{metrics['latenessMean'] * 1000:.1f}/{metrics['latenessMax'] * 1000:.1f} ms | "
+              f"{metrics['jitter'] * 1000:.1f} ms | {metrics['durationLast']:.2f}s]")
+
+    # Adaptive sampling per sensor
+    stats = getSamplingStats()
+    if stats:
+        print("[Sensor | Readings | Interval | Mean interval | Fast readings]")
+        print("---------------------------------------------------------------")
+        for sensorId, entry in stats.items():
+            print(f"[{sensorId} | {entry['samples']} | {entry['interval']}s | {entry['meanInterval']:.0f}s | {entry['fastShare'] * 100:.0f}%]")
+
+    # Live event streams (API clients)
+    metrics = bus.getMetrics()
+    print(f"Live streams: {metrics['subscribers']} subscribers, {metrics['published']} events published, {metrics['dropped']} dropped")
+
 # Show help
 def help():
     """Prints the help menu."""
@@ -218,9 +343,13 @@ def help():
     print("  add [plant,species,sensor]             Add a new plant, species or sensor")
     print("  delete [plant,species,sensor,measure]  Delete a plant, species, sensor or measurement")
     print("  show [plant,species,sensor,measure]    Show all plants, species, sensors or measurements")
+    print("  history                                Show aggregated measurements of the last days")
     print("  csv [import,export]                    Imports or exports all measurements using CSV")
     print("  predict                                Predict in how many hours the plant soil is dry")
+    print("  predict all                            Predict for all plants when they reach their minimum moisture")
+    print("  evaluate                               Evaluate predictions with test data and save a plot")
     print("  weather                                Show weather forecast")
+    print("  status                                 Show timing of the measurement and weather schedulers")
     print("  help                                   Show this help message")
     print("  exit,bye                               Exit")
 
@@ -233,5 +362,10 @@ def unknown():
 def bye():
     """Exits the system."""
     print("Goodbye!")
+    stopServer()
+    stopService()
+    stopMeasurement()
+    stopWeather()
+    close()
     logging.info("System shutdown.")
     sys.exit() 
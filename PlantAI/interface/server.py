@@ -0,0 +1,241 @@
+"""
+Description:
+    Local HTTP/JSON API for dashboards, runs next to the console interface
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from database.adapter import DBAdapterPlant, DBAdapterSpecies, DBAdapterSensor, DBAdapterMeasurement
+from core.events import bus
+from core.service import getService
+from system.loader import getConfig
+
+# Running server and the threads doing database work (each keeps its own pooled connection)
+server: ThreadingHTTPServer = None
+executor: ThreadPoolExecutor = None
+dbAdapterPlant = DBAdapterPlant()
+dbAdapterSpecies = DBAdapterSpecies()
+dbAdapterSensor = DBAdapterSensor()
+dbAdapterMeasurement = DBAdapterMeasurement()
+
+class HTTPError(Exception):
+    """Error that is sent to the client as JSON with its status code."""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def toDict(entry) -> dict:
+    """Converts a model (plant, species, sensor, measurement) to a JSON serializable dict."""
+    if hasattr(entry, "__slots__"):
+        return {name: getattr(entry, name) for name in entry.__slots__}
+    return dict(vars(entry))
+
+def query(function, *args):
+    """Runs database work on the worker pool and waits for the result."""
+    return executor.submit(function, *args).result()
+
+def getParameter(parameters: dict, name: str, type: type, default=None):
+    """Returns a query string parameter converted to type (400 if invalid)."""
+    if name not in parameters:
+        return default
+    try:
+        return type(parameters[name][0])
+    except ValueError:
+        raise HTTPError(400, f"Invalid value for {name}.")
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # Keep connections of dashboard clients open between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parameters = parse_qs(url.query)
+        try:
+            for pattern, name in routes:
+                match = re.fullmatch(pattern, url.path.rstrip("/") or "/")
+                if match:
+                    getattr(self, name)(parameters, *[int(group) for group in match.groups()])
+                    return
+            raise HTTPError(404, "Unknown path.")
+        except HTTPError as e:
+            self.sendJSON({"error": str(e)}, status=e.status)
+        except Exception as e:
+            logging.error(f"API request {self.path} failed: {e}")
+            self.sendJSON({"error": "Internal server error."}, status=500)
+
+    def sendJSON(self, data, status: int = 200, headers: dict = {}):
+        """Sends data as JSON response."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def notModified(self, etag: str, lastModified: int) -> bool:
+        """Returns True if the client already has the current version (If-None-Match / If-Modified-Since)."""
+        if "If-None-Match" in self.headers:
+            return etag in [tag.strip() for tag in self.headers["If-None-Match"].split(",")]
+        if "If-Modified-Since" in self.headers:
+            try:
+                return lastModified <= parsedate_to_datetime(self.headers["If-Modified-Since"]).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def getPlants(self, parameters: dict):
+        self.sendJSON([toDict(entry) for entry in query(dbAdapterPlant.getList)])
+
+    def getSpecies(self, parameters: dict):
+        self.sendJSON([toDict(entry) for entry in query(dbAdapterSpecies.getList)])
+
+    def getSensors(self, parameters: dict):
+        self.sendJSON([toDict(entry) for entry in query(dbAdapterSensor.getList)])
+
+    def getLatest(self, parameters: dict, sensor: int):
+        recentMeasurement = query(dbAdapterMeasurement.getLatest, sensor)
+        if recentMeasurement is None:
+            raise HTTPError(404, f"No measurements for sensor {sensor}.")
+
+        # Clients revalidate with the ETag (changes on new readings and when the cycle is archived)
+        etag = f'"{recentMeasurement.measureId}-{recentMeasurement.minUntilDry}"'
+        headers = {"ETag": etag, "Last-Modified": formatdate(recentMeasurement.timestamp, usegmt=True),
+                   "Cache-Control": "no-cache"}
+        if self.notModified(etag, recentMeasurement.timestamp):
+            self.send_response(304)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.sendJSON(toDict(recentMeasurement), headers=headers)
+
+    def getRange(self, parameters: dict, sensor: int):
+        # Default: the last 24 hours
+        end = getParameter(parameters, "end", int, int(time.time()))
+        start = getParameter(parameters, "start", int, end - 86400)
+        step = getParameter(parameters, "step", float)
+        points = getParameter(parameters, "points", int)
+        if start > end:
+            raise HTTPError(400, "start must be before end.")
+
+        # One list per column (see DBAdapterMeasurement.getRange)
+        resolution = dbAdapterMeasurement.getResolution(start, end, step, points)
+        columns = query(dbAdapterMeasurement.getRange, sensor, start, end, step, points)
+        data = {name: column.tolist() for name, column in columns.items()}
+        self.sendJSON({"sensorId": sensor, "resolution": resolution, **data})
+
+    def getPrediction(self, parameters: dict, sensor: int):
+        moisture = getParameter(parameters, "moisture", float)
+
+        # Trained and predicted in the worker processes, results are cached per sensor
+        minutes = query(getService().submit, sensor, moisture).result()
+        if minutes is None:
+            raise HTTPError(404, f"Not enough data for sensor {sensor}.")
+        self.sendJSON({"sensorId": sensor, "minutesUntilDry": minutes})
+
+    def getEvaluation(self, parameters: dict, sensor: int):
+        # Cached per data hash in the prediction processes (waited for here, not on the database threads),
+        # the plot path is only returned (not served)
+        try:
+            evaluation = getService().evaluate(sensor)
+        except ValueError:
+            raise HTTPError(404, f"Not enough archived measurements for sensor {sensor}.")
+        keys = ("model", "predictions", "mae", "r2", "hash", "plot")
+        self.sendJSON({"sensorId": sensor, **{key: evaluation[key] for key in keys if key in evaluation}})
+
+    def getPlantPredictions(self, parameters: dict):
+        # Joined and grouped queries on the worker pool, model calls in the prediction processes (waited for here,
+        # so slow predictions never block the database threads)
+        service = getService()
+        self.sendJSON(service.collectPlants(*query(service.submitPlants)))
+
+    def getStream(self, parameters: dict):
+        """Sends live events as Server-Sent Events (filters: ?sensor=1&topics=measurement,watering)."""
+        topics = set(parameters["topics"][0].split(",")) if "topics" in parameters else None
+        sensorId = getParameter(parameters, "sensor", int)
+        entry = bus.subscribe(getConfig("server", "streamQueue"), topics, sensorId)
+
+        # The stream ends with the connection (no Content-Length)
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            # Slow clients lose the oldest events (visible as gaps in the event IDs)
+            while True:
+                event = entry.get(timeout=getConfig("server", "keepalive"))
+                if event is None:
+                    if entry.closed:
+                        break
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    self.wfile.write(f"id: {event['id']}\nevent: {event['topic']}\ndata: {json.dumps(event['data'])}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            entry.close()
+
+    def log_message(self, format: str, *args):
+        # Requests go to the log file instead of the console
+        logging.debug(f"API {self.address_string()}: {format % args}")
+
+# Path patterns and their handler methods (groups are passed as int)
+routes = [
+    (r"/plants", "getPlants"),
+    (r"/plants/predictions", "getPlantPredictions"),
+    (r"/species", "getSpecies"),
+    (r"/sensors", "getSensors"),
+    (r"/sensors/(\d+)/latest", "getLatest"),
+    (r"/sensors/(\d+)/range", "getRange"),
+    (r"/sensors/(\d+)/prediction", "getPrediction"),
+    (r"/sensors/(\d+)/evaluation", "getEvaluation"),
+    (r"/stream", "getStream"),
+]
+
+def startServer() -> ThreadingHTTPServer:
+    """Starts the API in a background thread (if enabled in the config file)."""
+    global server, executor
+    if not getConfig("server", "enabled") or server is not None:
+        return server
+
+    # One thread per client connection, database work is limited to the worker pool
+    try:
+        server = ThreadingHTTPServer((getConfig("server", "host"), getConfig("server", "port")), RequestHandler)
+    except OSError as e:
+        logging.error(f"API could not be started: {e}")
+        return None
+    executor = ThreadPoolExecutor(max_workers=getConfig("server", "workers"), thread_name_prefix="api")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Logs
+    logging.info(f"API listening on {server.server_address[0]}:{server.server_address[1]}.")
+    return server
+
+def stopServer():
+    """Stops the API and its worker pool."""
+    global server, executor
+    if server is None:
+        return
+    server.shutdown()
+    bus.closeAll()
+    server.server_close()
+    executor.shutdown(wait=True)
+    server, executor = None, None
+
+    # Logs
+    logging.info("API stopped.")
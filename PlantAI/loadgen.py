@@ -0,0 +1,76 @@
+"""
+Description:
+    Load generator, drives virtual sensors with simulated ADCs into the database layer
+    Usage: python3 PlantAI/loadgen.py [--sensors 200] [--interval 0.5] [--duration 30] [--acceleration 3600]
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from core.adc import SimulatedADC
+from core.measurements import acquire
+from core.models import sensor
+from database import connector
+from database.adapter import DBAdapterMeasurement, DBAdapterSensor
+from database.connector import createDB, migrateDB, useDatabase, fetchone
+
+def run(sensors: int, interval: float, duration: float, acceleration: float, noise: float, path: str = None):
+    """Measures all virtual sensors every interval seconds and prints throughput and latency."""
+    # Use a temporary database unless a path was chosen
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "loadgen.db")
+    exists = os.path.exists(path)
+    useDatabase(path)
+    if exists:
+        migrateDB("PlantAI/database/PlantAI.sql")
+    else:
+        createDB("PlantAI/database/PlantAI.sql")
+
+    # Create virtual sensors with one simulated ADC each
+    dbAdapterSensor = DBAdapterSensor()
+    dbAdapterMeasurement = DBAdapterMeasurement()
+    first = fetchone("SELECT IFNULL(MAX(sensorId), 0) FROM sensors")[0]
+    for x in range(sensors):
+        dbAdapterSensor.insert(sensor(i2cAddress=0x1000 + first + x))
+    channels = [(entry, SimulatedADC(entry.i2cAddress, acceleration, noise), 0)
+                for entry in dbAdapterSensor.getList() if entry.sensorId > first]
+
+    # Fixed-rate ticks, timestamps follow the simulated clock
+    start = time.monotonic(); begin = int(time.time())
+    latencies = []; rows = 0; tick = 0
+    while time.monotonic() - start < duration:
+        tickStart = time.monotonic()
+        timestamp = begin + int((tickStart - start) * acceleration)
+        rows += acquire(dbAdapterMeasurement, channels, 1, timestamp)
+        latencies.append(time.monotonic() - tickStart)
+
+        # Wait for next tick
+        tick += 1
+        time.sleep(max(0.0, start + tick * interval - time.monotonic()))
+
+    # Print results
+    elapsed = time.monotonic() - start
+    archived = fetchone("SELECT COUNT(*) FROM measurements WHERE sensorId > ? AND minUntilDry != '-1'", (first,))[0]
+    latencies.sort()
+    print(f"Database:        {path}")
+    print(f"Ticks:           {tick} ({sensors} sensors, {interval}s interval, x{acceleration} time)")
+    print(f"Rows inserted:   {rows} ({rows / elapsed:.0f} rows/s)")
+    print(f"Rows archived:   {archived} (by watering events)")
+    print(f"Tick latency:    median {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    connector.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drives virtual sensors into the PlantAI database.")
+    parser.add_argument("--sensors", type=int, default=200, help="amount of virtual sensors")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between measurements")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--acceleration", type=float, default=3600.0, help="simulated seconds per real second")
+    parser.add_argument("--noise", type=float, default=0.1, help="standard deviation of the sensor noise")
+    parser.add_argument("--db", default=None, help="database file (default: temporary)")
+    args = parser.parse_args()
+    run(args.sensors, args.interval, args.duration, args.acceleration, args.noise, args.db)
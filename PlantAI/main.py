@@ -8,35 +8,49 @@ Created: 24.09.2025
 import logging
 import os
 import threading
+from core.features import saveWeather
 from core.measurements import saveMeasurement
-from database.connector import createDB
-from database.adapter import DBAdapterPlant, DBAdapterSpecies, DBAdapterSensor, DBAdapterMeasurement
+from database.connector import createDB, migrateDB
+from database.adapter import DBAdapterPlant, DBAdapterSpecies, DBAdapterSensor, DBAdapterMeasurement, DBAdapterWeather
 from interface.console import mainMenu
+from interface.server import startServer
 from system.loader import getConfig
 
-# Create log file
+# Create log file (also used by the prediction worker processes)
 logging.basicConfig(
     filename='PlantAI/system/plantai.log', filemode='a', level=logging.INFO,
     format='%(asctime)s: %(levelname)s - %(message)s'
 )
 
-# Create database if it doesn't exist
-dbPath = getConfig("database","path")
-if not os.path.exists(dbPath):
-    createDB("PlantAI/database/PlantAI.sql")
+# Prediction worker processes import this file again, only the main process starts the system
+if __name__ == "__main__":
+    # Create database if it doesn't exist
+    dbPath = getConfig("database","path")
+    if not os.path.exists(dbPath):
+        createDB("PlantAI/database/PlantAI.sql")
+    else:
+        migrateDB("PlantAI/database/PlantAI.sql")
 
-# Initialize database adapters
-dbAdapterPlant = DBAdapterPlant()
-dbAdapterSpecies = DBAdapterSpecies()
-dbAdapterSensor = DBAdapterSensor()
-dbAdapterMeasurement = DBAdapterMeasurement()
+    # Initialize database adapters
+    dbAdapterPlant = DBAdapterPlant()
+    dbAdapterSpecies = DBAdapterSpecies()
+    dbAdapterSensor = DBAdapterSensor()
+    dbAdapterMeasurement = DBAdapterMeasurement()
+    dbAdapterWeather = DBAdapterWeather()
 
-# Start new thread for reading sensor data
-thread = threading.Thread(target=saveMeasurement, args=(dbAdapterMeasurement,), daemon=True)
-thread.start()
+    # Start new thread for reading sensor data
+    thread = threading.Thread(target=saveMeasurement, args=(dbAdapterMeasurement, dbAdapterSensor, dbAdapterPlant), daemon=True)
+    thread.start()
 
-# Logs
-logging.info("System booted.")
+    # Start new thread for storing weather forecasts (used as prediction features)
+    weatherThread = threading.Thread(target=saveWeather, args=(dbAdapterWeather,), daemon=True)
+    weatherThread.start()
 
-# Initialize Console
-mainMenu(dbAdapterPlant, dbAdapterSpecies, dbAdapterSensor, dbAdapterMeasurement)
+    # Start local HTTP/JSON API for dashboards
+    startServer()
+
+    # Logs
+    logging.info("System booted.")
+
+    # Initialize Console
+    mainMenu(dbAdapterPlant, dbAdapterSpecies, dbAdapterSensor, dbAdapterMeasurement, dbAdapterWeather)
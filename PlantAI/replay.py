@@ -0,0 +1,59 @@
+"""
+Description:
+    Replays saved measurements through the watering detector to evaluate its settings offline
+    Usage: python3 PlantAI/replay.py [--db path] [--sensor id] [--alpha 0.2] [--drift 1.0] [--threshold 10.0]
+Author: Tim Grundey
+Created: 18.10.2026
+"""
+
+import argparse
+import time
+from core.detection import WateringDetector
+from core.models import measurementSeries
+from database.adapter import DBAdapterMeasurement
+from database.connector import useDatabase
+from system.loader import getConfig
+
+def replay(series: measurementSeries, alpha: float, drift: float, threshold: float) -> dict:
+    """Returns detected, expected and matching watering events of a sensor's series and the amount of readings."""
+    moistures = series.moisture
+    minUntilDry = series.minUntilDry
+
+    # Saved waterings: the last measurement of a drying cycle has 0 minutes until dry
+    expected = {index + 1 for index in range(len(minUntilDry) - 1) if minUntilDry[index] == 0}
+
+    # Feed every reading into a new detector
+    detector = WateringDetector(alpha, drift, threshold)
+    # Watering is confirmed one reading after the rise started
+    detected = {index - 1 for index, moisture in enumerate(moistures) if detector.update(moisture)}
+    return {"readings": len(moistures), "expected": len(expected), "detected": len(detected),
+            "matched": len(expected & detected)}
+
+if __name__ == "__main__":
+    settings = getConfig("core", "detection")
+    parser = argparse.ArgumentParser(description="Evaluates the watering detector on saved measurements.")
+    parser.add_argument("--db", default=None, help="database file (default: from config)")
+    parser.add_argument("--sensor", type=int, default=None, help="sensor ID (default: all sensors)")
+    parser.add_argument("--alpha", type=float, default=settings["alpha"])
+    parser.add_argument("--drift", type=float, default=settings["drift"])
+    parser.add_argument("--threshold", type=float, default=settings["threshold"])
+    args = parser.parse_args()
+    if args.db is not None:
+        useDatabase(args.db)
+
+    # Load the history once (grouped by sensor), replay every sensor on its view and sum up the results
+    start = time.perf_counter()
+    series = DBAdapterMeasurement().getSeries(sensor=args.sensor)
+    total = {"readings": 0, "expected": 0, "detected": 0, "matched": 0}
+    for sensor in dict.fromkeys(series.sensorId):
+        result = replay(series.sensor(sensor), args.alpha, args.drift, args.threshold)
+        print(f"Sensor {sensor}: {result['readings']} readings, {result['expected']} waterings saved, "
+              f"{result['detected']} detected, {result['matched']} matching")
+        for key in total:
+            total[key] += result[key]
+    duration = time.perf_counter() - start
+
+    # Print precision and recall against the saved waterings
+    precision = total["matched"] / total["detected"] if total["detected"] else 0.0
+    recall = total["matched"] / total["expected"] if total["expected"] else 0.0
+    print(f"Total: precision {precision:.3f}, recall {recall:.3f}, {total['readings'] / duration:.0f} readings/s")
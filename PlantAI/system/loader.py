@@ -5,10 +5,29 @@ Author: Tim Grundey
 Created: 14.10.2025
 """
 
+import os
+import threading
 import yaml
 
+# Parsed config, shared by all threads and reloaded when the file changes
+path = "PlantAI/system/config.yaml"
+config: dict = {}
+modified = None
+lock = threading.Lock()
+
+def loadConfig() -> dict:
+    """Returns the parsed config file, parses it again only if it was modified."""
+    global config, modified
+    mtime = os.stat(path).st_mtime_ns
+    if mtime != modified:
+        with lock:
+            # Check again, another thread may have reloaded in the meantime
+            if mtime != modified:
+                with open(path) as stream:
+                    config = yaml.safe_load(stream)
+                modified = mtime
+    return config
+
 def getConfig(dir1: str, dir2: str):
     """Returns a value stored in the config file under a certain path."""
-    with open("PlantAI/system/config.yaml") as stream:
-        config = yaml.safe_load(stream)
-        return config[dir1][dir2]
+    return loadConfig()[dir1][dir2]